@@ -0,0 +1,478 @@
+import functools
+import hashlib
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import weakref
+import numpy as np
+import soundfile as sf
+from core.cache import signal_hash, touch, prune_files
+from core.metrics import timed
+
+DEFAULT_BLOCK_SIZE = 65536
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), 'dsp_studio_exports')
+EXPORT_MAX_BYTES = int(os.environ.get('DSP_EXPORT_MAX_BYTES', 1024 ** 3))
+DECODE_DIR = os.path.join(tempfile.gettempdir(), 'dsp_studio_decoded')
+DECODE_MAX_BYTES = int(os.environ.get('DSP_DECODE_MAX_BYTES', 4 * 1024 ** 3))
+COMPRESSED_SUFFIXES = ('.mp3', '.m4a', '.aac', '.ogg', '.oga', '.opus', '.wma')
+
+class AudioSource:
+    """
+    Lazy, disk-backed view of an audio file.
+
+    The file is never decoded in one piece: samples are read through
+    soundfile in fixed-size blocks and downmixed to mono float32 block by
+    block. The full mono signal, when needed, is a read-only memory map
+    backed by a float32 file next to the spooled audio; the same is
+    available with every channel kept (channel_samples).
+
+    Temporary files (the spooled copy of an owned file and the memory map
+    files) are removed by close(), or at the latest when the source is
+    garbage collected or the process exits, so a session that ends without
+    closing its source does not leave them behind.
+    """
+
+    def __init__(self, path, owns_file=False):
+        """
+        Args:
+            path (str): Path to an audio file readable by soundfile.
+            owns_file (bool): Delete the file (and its cache) on close().
+        """
+        self.path = path
+        self.owns_file = owns_file
+        info = sf.info(path)
+        self.fs = info.samplerate
+        self.frames = info.frames
+        self.channels = info.channels
+        self._samples = None
+        self._samples_path = None
+        self._channel_samples = None
+        self._channel_samples_path = None
+        # Shared with the finalizer, which must not hold a reference to self.
+        self._temp_paths = [path] if owns_file else []
+        weakref.finalize(self, _remove_files, self._temp_paths)
+
+    @classmethod
+    def from_upload(cls, uploaded_file, suffix=None, cache_dir=None):
+        """
+        Spools an uploaded (file-like) object to a temporary file on disk.
+
+        Args:
+            uploaded_file (file-like): Source stream, e.g. a Streamlit UploadedFile.
+            suffix (str): File extension for the spooled copy. Defaults to the
+                extension of `uploaded_file.name`, or '.wav'.
+            cache_dir (str): Where compressed uploads are decoded to
+                (default: DECODE_DIR).
+
+        Returns:
+            AudioSource: Source reading from the spooled copy.
+        """
+        if suffix is None:
+            name = getattr(uploaded_file, 'name', '') or ''
+            suffix = os.path.splitext(name)[1] or '.wav'
+
+        # Compressed uploads are decoded once into DECODE_DIR; opening the
+        # same file again only hashes the upload and finds the decoded copy.
+        # The source reads a private link to it, which pruning the shared
+        # directory cannot remove.
+        compressed = suffix.lower() in COMPRESSED_SUFFIXES
+        if compressed:
+            digest = _stream_hash(uploaded_file)
+            private = _private_copy(_decoded_path(digest, cache_dir))
+            if private is not None:
+                return cls(private, owns_file=True)
+
+        fd, path = tempfile.mkstemp(prefix='dsp_studio_', suffix=suffix)
+        if hasattr(uploaded_file, 'seek'):
+            uploaded_file.seek(0)
+        with os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(uploaded_file, out, DEFAULT_BLOCK_SIZE * 16)
+        if hasattr(uploaded_file, 'seek'):
+            uploaded_file.seek(0)
+
+        if compressed:
+            try:
+                decoded = decode_audio(path, cache_dir=cache_dir, digest=digest)
+            finally:
+                os.remove(path)
+            private = _private_copy(decoded)
+            if private is None:
+                raise FileNotFoundError(f"{decoded} was removed before it could be opened")
+            return cls(private, owns_file=True)
+
+        return cls(path, owns_file=True)
+
+    @property
+    def duration(self):
+        return self.frames / self.fs if self.fs else 0.0
+
+    def __len__(self):
+        return self.frames
+
+    def _resolve(self, start, stop):
+        start = 0 if start is None else start
+        stop = self.frames if stop is None else stop
+        if start < 0:
+            start += self.frames
+        if stop < 0:
+            stop += self.frames
+        start = min(max(start, 0), self.frames)
+        stop = min(max(stop, start), self.frames)
+        return start, stop
+
+    def blocks(self, block_size=DEFAULT_BLOCK_SIZE, start=0, stop=None, mono=True):
+        """
+        Iterates over the file as float32 blocks.
+
+        Args:
+            block_size (int): Samples per block (the last one may be shorter).
+            start (int): First sample to read.
+            stop (int): One past the last sample to read (None = end of file).
+            mono (bool): Downmix to mono; otherwise blocks keep every
+                channel, shape (samples, channels).
+
+        Yields:
+            np.array: Float32 chunks.
+        """
+        start, stop = self._resolve(start, stop)
+        if stop <= start:
+            return
+        for block in sf.blocks(self.path, blocksize=block_size, start=start, stop=stop,
+                               dtype='float32', always_2d=True):
+            yield _downmix(block) if mono else block
+
+    def read(self, start=0, stop=None):
+        """
+        Reads a window of the file as a mono float32 array.
+
+        Args:
+            start (int): First sample to read.
+            stop (int): One past the last sample to read (None = end of file).
+
+        Returns:
+            np.array: Mono float32 samples in [start, stop).
+        """
+        if self._samples is not None:
+            start, stop = self._resolve(start, stop)
+            return self._samples[start:stop]
+
+        start, stop = self._resolve(start, stop)
+        out = np.empty(stop - start, dtype=np.float32)
+        pos = 0
+        for block in self.blocks(start=start, stop=stop):
+            out[pos:pos + len(block)] = block
+            pos += len(block)
+        return out
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            window = self.read(key.start, key.stop)
+            return window[::key.step] if key.step not in (None, 1) else window
+        return self.samples[key]
+
+    @property
+    def samples(self):
+        """
+        The whole mono signal as a read-only float32 memory map.
+
+        Built on first access by streaming the file block by block into a
+        raw float32 file, so only one block is decoded at a time and the
+        pages of the map can be dropped by the OS under memory pressure.
+        """
+        if self._samples is None:
+            self._samples = self._build_samples()
+        return self._samples
+
+    @property
+    def channel_samples(self):
+        """
+        The whole signal with every channel kept, as a read-only float32
+        memory map of shape (samples, channels). Built on first access like
+        samples.
+        """
+        if self._channel_samples is None:
+            self._channel_samples, self._channel_samples_path = self._build_map(mono=False)
+        return self._channel_samples
+
+    def _build_samples(self):
+        samples, self._samples_path = self._build_map(mono=True)
+        return samples
+
+    def _build_map(self, mono):
+        fd, path = tempfile.mkstemp(prefix='dsp_studio_', suffix='.f32')
+        os.close(fd)
+        self._temp_paths.append(path)
+        shape = (self.frames,) if mono else (self.frames, self.channels)
+
+        if self.frames == 0:
+            return np.zeros(shape, dtype=np.float32), path
+
+        mm = np.memmap(path, dtype=np.float32, mode='w+', shape=shape)
+        pos = 0
+        for block in self.blocks(mono=mono):
+            mm[pos:pos + len(block)] = block
+            pos += len(block)
+        mm.flush()
+        del mm
+
+        return np.memmap(path, dtype=np.float32, mode='r', shape=shape), path
+
+    def close(self):
+        """
+        Drops the memory map and removes temporary files owned by this source.
+        """
+        self._samples = None
+        self._channel_samples = None
+        _remove_files(self._temp_paths)
+        self._samples_path = None
+        self._channel_samples_path = None
+
+def _remove_files(paths):
+    """
+    Removes the files in paths that still exist and empties the list.
+    """
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    paths.clear()
+
+def _downmix(block):
+    """
+    Averages the channels of a (frames, channels) float32 block into mono.
+    """
+    if block.shape[1] == 1:
+        return block[:, 0].copy()
+    return block.mean(axis=1, dtype=np.float32)
+
+@timed
+def export_audio(signal, fs, fmt='WAV', subtype='PCM_16', cache_dir=None, block_size=DEFAULT_BLOCK_SIZE,
+                 max_bytes=None):
+    """
+    Encodes a signal to a compact audio file, once per distinct signal.
+
+    The file name is derived from the signal's content hash, so repeated
+    calls with the same audio return the existing file immediately. Samples
+    are clipped to [-1, 1] and written block by block. After each new file
+    the least recently used exports are removed until the directory fits in
+    max_bytes.
+
+    Args:
+        signal (np.array): Signal, (samples,) or (samples, channels).
+        fs (int): Sampling rate.
+        fmt (str): Container format ('WAV' or 'FLAC').
+        subtype (str): Sample format, e.g. 'PCM_16'.
+        cache_dir (str): Output directory (default: EXPORT_DIR).
+        block_size (int): Samples written per step.
+        max_bytes (int): Size budget of cache_dir (default: EXPORT_MAX_BYTES).
+
+    Returns:
+        str: Path to the encoded file.
+    """
+    cache_dir = cache_dir or EXPORT_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    name = f"{signal_hash(signal)}_{fs}_{subtype.lower()}.{fmt.lower()}"
+    path = os.path.join(cache_dir, name)
+    if os.path.exists(path):
+        touch(path)
+        return path
+
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=cache_dir, suffix='.' + fmt.lower())
+    os.close(fd)
+    try:
+        channels = signal.shape[1] if np.ndim(signal) == 2 else 1
+        with sf.SoundFile(tmp_path, 'w', samplerate=fs, channels=channels, format=fmt, subtype=subtype) as f:
+            for start in range(0, len(signal), block_size):
+                f.write(np.clip(signal[start:start + block_size], -1.0, 1.0))
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    prune_files(cache_dir, EXPORT_MAX_BYTES if max_bytes is None else max_bytes, keep=(path,))
+    return path
+
+@functools.lru_cache(maxsize=None)
+def ffmpeg_path():
+    """
+    Locates the ffmpeg binary, once per process.
+
+    static_ffmpeg (if installed) is asked to put its bundled binaries on
+    PATH the first time; later calls return the remembered result.
+
+    Returns:
+        str: Path to ffmpeg, or None if it is not available.
+    """
+    try:
+        import static_ffmpeg
+        static_ffmpeg.add_paths()
+    except Exception:
+        pass
+    return shutil.which('ffmpeg')
+
+def _stream_hash(stream, chunk_size=DEFAULT_BLOCK_SIZE * 16):
+    h = hashlib.blake2b(digest_size=16)
+    if hasattr(stream, 'getbuffer'):
+        h.update(stream.getbuffer())
+        return h.hexdigest()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        h.update(chunk)
+    stream.seek(0)
+    return h.hexdigest()
+
+def _decoded_path(digest, cache_dir=None):
+    return os.path.join(cache_dir or DECODE_DIR, f"{digest}.wav")
+
+def _private_copy(path):
+    """
+    Gives a cached file a temporary name of its own: a hard link, or a copy
+    where links are not supported. The data stays readable through it after
+    the cache entry itself is pruned.
+
+    Returns:
+        str: Path of the private copy, or None if path does not exist.
+    """
+    fd, copy = tempfile.mkstemp(prefix='dsp_studio_', suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    os.remove(copy)
+    try:
+        os.link(path, copy)
+    except FileNotFoundError:
+        return None
+    except OSError:
+        try:
+            shutil.copyfile(path, copy)
+        except FileNotFoundError:
+            return None
+    touch(path)
+    return copy
+
+@timed
+def decode_audio(path, cache_dir=None, block_size=DEFAULT_BLOCK_SIZE, digest=None, max_bytes=None):
+    """
+    Decodes a compressed audio file to a float32 WAV, once per distinct file.
+
+    The decoded copy is named after the hash of the compressed bytes, so
+    decoding the same file again returns the existing copy immediately.
+    Formats libsndfile reads (MP3, Ogg/Vorbis, Opus) are decoded block by
+    block through soundfile; anything else is streamed from an ffmpeg
+    subprocess pipe. Neither path holds more than one block of PCM in
+    memory. After each new decode the least recently opened copies are
+    removed until the directory fits in max_bytes.
+
+    Args:
+        path (str): Compressed audio file.
+        cache_dir (str): Output directory (default: DECODE_DIR).
+        block_size (int): Samples decoded per step.
+        digest (str): Content hash of the file, if already known.
+        max_bytes (int): Size budget of cache_dir (default: DECODE_MAX_BYTES).
+
+    Returns:
+        str: Path to the decoded float32 WAV.
+    """
+    cache_dir = cache_dir or DECODE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    if digest is None:
+        with open(path, 'rb') as f:
+            digest = _stream_hash(f)
+    out_path = _decoded_path(digest, cache_dir)
+    if os.path.exists(out_path):
+        touch(out_path)
+        return out_path
+
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=cache_dir, suffix='.wav')
+    os.close(fd)
+    try:
+        try:
+            sf.info(path)
+        except RuntimeError:
+            _decode_ffmpeg(path, tmp_path, block_size)
+        else:
+            _decode_soundfile(path, tmp_path, block_size)
+        os.replace(tmp_path, out_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    prune_files(cache_dir, DECODE_MAX_BYTES if max_bytes is None else max_bytes, keep=(out_path,))
+    return out_path
+
+def _decode_soundfile(path, out_path, block_size):
+    with sf.SoundFile(path) as src, \
+         sf.SoundFile(out_path, 'w', samplerate=src.samplerate, channels=src.channels,
+                      format='WAV', subtype='FLOAT') as dst:
+        for block in src.blocks(blocksize=block_size, dtype='float32', always_2d=True):
+            dst.write(block)
+
+def _decode_ffmpeg(path, out_path, block_size):
+    ffmpeg = ffmpeg_path()
+    if ffmpeg is None:
+        raise RuntimeError(f"Cannot decode {os.path.basename(path)}: ffmpeg was not found.")
+
+    cmd = [ffmpeg, '-v', 'error', '-nostdin', '-i', path, '-vn', '-map_metadata', '-1',
+           '-c:a', 'pcm_f32le', '-f', 'wav', '-']
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    error = None
+    try:
+        fs, channels = read_wav_header(proc.stdout)
+        frame_bytes = 4 * channels
+        with sf.SoundFile(out_path, 'w', samplerate=fs, channels=channels,
+                          format='WAV', subtype='FLOAT') as dst:
+            for chunk in iter(lambda: proc.stdout.read(block_size * frame_bytes), b''):
+                usable = len(chunk) - len(chunk) % frame_bytes
+                dst.write(np.frombuffer(chunk[:usable], dtype='<f4').reshape(-1, channels))
+    except RuntimeError as e:
+        error = e
+    finally:
+        # Closing stdout first makes an ffmpeg still writing to it exit
+        # instead of blocking on a full pipe while we wait for it.
+        proc.stdout.close()
+        err = proc.stderr.read()
+        proc.stderr.close()
+        returncode = proc.wait()
+    # A failed decode usually surfaces as a bad or empty stream; report
+    # ffmpeg's own message then. A negative code is the signal from the
+    # pipe closed above.
+    if error is not None and returncode <= 0:
+        raise error
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {os.path.basename(path)}: {err.decode(errors='replace').strip()}")
+
+def read_wav_header(stream):
+    """
+    Reads a WAV header from a non-seekable stream, up to the sample data.
+
+    Chunk sizes in the RIFF and data headers are ignored, since encoders
+    writing to a pipe cannot fill them in.
+
+    Args:
+        stream (file-like): Binary stream positioned at the start of the file.
+
+    Returns:
+        int: Sampling rate.
+        int: Number of channels.
+    """
+    header = stream.read(12)
+    if len(header) < 12 or header[:4] not in (b'RIFF', b'RF64') or header[8:12] != b'WAVE':
+        raise RuntimeError("Decoder output is not a WAV stream.")
+
+    fmt = None
+    while True:
+        chunk = stream.read(8)
+        if len(chunk) < 8:
+            raise RuntimeError("WAV stream ended before the sample data.")
+        chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+        if chunk_id == b'data':
+            break
+        body = stream.read(size + (size & 1))
+        if chunk_id == b'fmt ':
+            fmt = body
+
+    if fmt is None:
+        raise RuntimeError("WAV stream has no format chunk.")
+    channels, fs = struct.unpack('<HI', fmt[2:8])
+    return fs, channels
@@ -0,0 +1,543 @@
+import functools
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+import numpy as np
+from core.metrics import timed, default_registry as metrics
+
+DEFAULT_MAX_BYTES = int(os.environ.get('DSP_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+DISK_CACHE_DIR = os.environ.get('DSP_DISK_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'dsp_studio_cache'))
+DISK_CACHE_MAX_BYTES = int(os.environ.get('DSP_DISK_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+# Part of every on-disk key; bump when a persisted function's output changes.
+DISK_CACHE_VERSION = 3
+
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+@timed
+def signal_hash(signal):
+    """
+    Computes a content hash of an array.
+
+    The digest covers dtype, shape and data. For arrays whose memory cannot
+    be written through any view (such as the memory-mapped audio from
+    AudioSource, opened with mode='r') the digest is remembered for the
+    lifetime of the array object, so hashing the same loaded file again on
+    the next rerun is free.
+
+    Args:
+        signal (np.array): Input array.
+
+    Returns:
+        str: Hex digest.
+    """
+    memoize = isinstance(signal, np.ndarray) and _immutable(signal)
+    if memoize:
+        with _hash_lock:
+            entry = _hash_memo.get(id(signal))
+        if entry is not None and entry[0]() is signal:
+            return entry[1]
+
+    arr = np.ascontiguousarray(signal)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(arr.dtype).encode())
+    h.update(str(arr.shape).encode())
+    h.update(memoryview(arr).cast('B'))
+    digest = h.hexdigest()
+
+    if memoize:
+        key = id(signal)
+        ref = weakref.ref(signal, lambda _ref, key=key: _forget_hash(key, _ref))
+        with _hash_lock:
+            _hash_memo[key] = (ref, digest)
+
+    return digest
+
+def _immutable(signal):
+    """
+    Whether an array's data can never change: it and every array it views
+    are read-only, and the buffer at the root is read-only too (e.g. an
+    mmap opened for reading). A read-only flag alone is not enough, since
+    a writable base, or an array that owns its data and is switched back to
+    writable, can still change the contents.
+    """
+    base = signal
+    while isinstance(base, np.ndarray):
+        if base.flags.writeable or base.base is None:
+            return False
+        base = base.base
+    try:
+        with memoryview(base) as view:
+            return view.readonly
+    except TypeError:
+        return False
+
+def _forget_hash(key, ref):
+    with _hash_lock:
+        entry = _hash_memo.get(key)
+        if entry is not None and entry[0] is ref:
+            del _hash_memo[key]
+
+def _nbytes(value):
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return getattr(value, 'nbytes', 0)
+
+def _freeze(value, inputs=()):
+    """
+    Marks cached arrays read-only so a caller cannot corrupt a shared result.
+
+    Arrays that alias one of the inputs (e.g. a pass-through when no
+    resampling is needed) are left alone, so the caller's own data keeps
+    its flags.
+    """
+    if isinstance(value, np.ndarray):
+        if not any(np.may_share_memory(value, a) for a in inputs):
+            value.flags.writeable = False
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            _freeze(v, inputs)
+    return value
+
+def _aliases(value, inputs):
+    """
+    Whether a result shares memory with one of the inputs (a pass-through
+    that is not worth writing to disk).
+    """
+    if isinstance(value, np.ndarray):
+        return any(np.may_share_memory(value, a) for a in inputs)
+    if isinstance(value, (tuple, list)):
+        return any(_aliases(v, inputs) for v in value)
+    return False
+
+class ResultCache:
+    """
+    Thread-safe LRU cache for DSP results, bounded by total array size.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            max_bytes (int): Budget for the summed nbytes of all cached arrays.
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = _nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            self._evict()
+        return value
+
+    def resize(self, max_bytes):
+        """
+        Changes the byte budget, evicting entries if it shrank.
+        """
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss/eviction counters, entry count and bytes in use.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+default_cache = ResultCache()
+
+def touch(path):
+    """
+    Marks a cached file as just used: sets its access time to now and keeps
+    its modification time (the file itself did not change).
+    """
+    try:
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+    except OSError:
+        pass
+
+def prune_files(path, max_bytes, keep=()):
+    """
+    Removes the least recently used files of a cache directory until its
+    total size fits in max_bytes.
+
+    Recency is the access time, which the caches refresh with touch() on
+    every hit. Hidden files (in-progress writes named '.tmp-*') and the
+    paths in keep are never removed.
+
+    Args:
+        path (str): Directory of cached files.
+        max_bytes (int): Size budget.
+        keep (tuple): Paths that must survive, e.g. the file just written.
+
+    Returns:
+        int: Number of files removed.
+    """
+    keep = {os.path.abspath(p) for p in keep}
+    files = []
+    total = 0
+    for entry in os.scandir(path):
+        try:
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            st = entry.stat()
+        except OSError:
+            continue
+        total += st.st_size
+        if os.path.abspath(entry.path) not in keep:
+            files.append((st.st_atime, st.st_size, entry.path))
+
+    removed = 0
+    for _, size, file_path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(file_path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+_MANIFEST = 'manifest.json'
+_PERSIST_PACKAGES = ('core', 'interface')
+_STALE_TMP_SECONDS = 3600
+
+def _encode(value, arrays):
+    """
+    Describes a result as JSON, moving its arrays into `arrays`.
+    """
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            raise TypeError("object arrays cannot be persisted")
+        arrays.append(value)
+        return {'array': len(arrays) - 1}
+    if isinstance(value, np.generic):
+        arrays.append(np.asarray(value))
+        return {'scalar': len(arrays) - 1}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return {'value': value}
+    if isinstance(value, (tuple, list)):
+        return {type(value).__name__: [_encode(v, arrays) for v in value]}
+    if isinstance(value, dict) and all(isinstance(k, str) for k in value):
+        return {'dict': {k: _encode(v, arrays) for k, v in value.items()}}
+    cls = type(value)
+    if hasattr(value, '__dict__') and cls.__module__.split('.')[0] in _PERSIST_PACKAGES:
+        return {'object': f"{cls.__module__}:{cls.__qualname__}", 'state': _encode(vars(value), arrays)['dict']}
+    raise TypeError(f"cannot persist {cls.__name__}")
+
+def _decode(spec, entry):
+    if 'array' in spec:
+        path = os.path.join(entry, f"{spec['array']}.npy")
+        try:
+            return np.load(path, mmap_mode='r', allow_pickle=False)
+        except ValueError:
+            # Empty arrays cannot be memory-mapped.
+            return np.load(path, allow_pickle=False)
+    if 'scalar' in spec:
+        return np.load(os.path.join(entry, f"{spec['scalar']}.npy"), allow_pickle=False)[()]
+    if 'value' in spec:
+        return spec['value']
+    if 'tuple' in spec:
+        return tuple(_decode(v, entry) for v in spec['tuple'])
+    if 'list' in spec:
+        return [_decode(v, entry) for v in spec['list']]
+    if 'dict' in spec:
+        return {k: _decode(v, entry) for k, v in spec['dict'].items()}
+    module, qualname = spec['object'].split(':')
+    if module.split('.')[0] not in _PERSIST_PACKAGES:
+        raise TypeError(f"refusing to load {spec['object']}")
+    cls = importlib.import_module(module)
+    for name in qualname.split('.'):
+        cls = getattr(cls, name)
+    obj = cls.__new__(cls)
+    obj.__dict__.update({k: _decode(v, entry) for k, v in spec['state'].items()})
+    return obj
+
+def _dir_size(path):
+    return sum(f.stat().st_size for f in os.scandir(path) if f.is_file())
+
+class DiskCache:
+    """
+    Persistent store for DSP results, shared between processes and bounded
+    by total size on disk.
+
+    Each entry is a directory named after the hash of its key. It holds one
+    .npy file per array plus a JSON manifest of how they nest into the
+    result (tuples, lists, dicts and plain objects of this package such as
+    WaveformPyramid). Entries are written to a temporary directory and
+    renamed into place, so a reader in another process only ever sees
+    complete entries. Arrays come back as read-only memory maps. When the
+    total size exceeds max_bytes the least recently used entries (by
+    directory mtime, refreshed on every hit) are removed.
+    """
+
+    def __init__(self, path=DISK_CACHE_DIR, max_bytes=DISK_CACHE_MAX_BYTES):
+        """
+        Args:
+            path (str): Cache directory; may be shared by several processes.
+            max_bytes (int): Budget for the summed size of all entries
+                (0 disables the cache).
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key):
+        digest = hashlib.blake2b(repr((DISK_CACHE_VERSION, key)).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.path, digest)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key, default=None):
+        if self.max_bytes <= 0:
+            return default
+        entry = self._entry_path(key)
+        try:
+            with open(os.path.join(entry, _MANIFEST)) as f:
+                value = _decode(json.load(f), entry)
+            os.utime(entry)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, ImportError):
+            # Missing, evicted by another process meanwhile, or unreadable.
+            self._count('misses')
+            return default
+        self._count('hits')
+        return value
+
+    def put(self, key, value):
+        if self.max_bytes <= 0:
+            return value
+        entry = self._entry_path(key)
+        if os.path.isdir(entry):
+            return value
+        arrays = []
+        try:
+            manifest = _encode(value, arrays)
+        except TypeError:
+            return value
+        if sum(a.nbytes for a in arrays) > self.max_bytes:
+            return value
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix='.tmp-', dir=self.path)
+        try:
+            for i, a in enumerate(arrays):
+                np.save(os.path.join(tmp, f"{i}.npy"), a, allow_pickle=False)
+            with open(os.path.join(tmp, _MANIFEST), 'w') as f:
+                json.dump(manifest, f)
+            # Fails if another process stored the same entry first.
+            os.rename(tmp, entry)
+        except (OSError, ValueError):
+            shutil.rmtree(tmp, ignore_errors=True)
+            return value
+        self._count('writes')
+        self._evict()
+        return value
+
+    def _scan(self):
+        entries = []
+        now = time.time()
+        for e in os.scandir(self.path):
+            try:
+                if not e.is_dir():
+                    continue
+                mtime = e.stat().st_mtime
+                if e.name.startswith('.'):
+                    # Left behind by a process that died mid-write.
+                    if now - mtime > _STALE_TMP_SECONDS:
+                        shutil.rmtree(e.path, ignore_errors=True)
+                    continue
+                entries.append((mtime, _dir_size(e.path), e.path))
+            except OSError:
+                continue
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._scan())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                self.evictions += 1
+
+    def resize(self, max_bytes):
+        """
+        Changes the byte budget, evicting entries if it shrank.
+        """
+        self.max_bytes = max_bytes
+        if os.path.isdir(self.path):
+            self._evict()
+
+    def clear(self):
+        if os.path.isdir(self.path):
+            for _, _, path in self._scan():
+                shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss/write/eviction counters of this process, entry
+                count and bytes on disk.
+        """
+        entries = self._scan() if os.path.isdir(self.path) else []
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes,
+            }
+
+default_disk_cache = DiskCache()
+
+def _key_part(value):
+    if isinstance(value, np.ndarray):
+        return ('ndarray', signal_hash(value))
+    return value
+
+@functools.lru_cache(maxsize=256)
+def _signature(func):
+    try:
+        return inspect.signature(func)
+    except (TypeError, ValueError):
+        return None
+
+def call_key(func, args=(), kwargs=None):
+    """
+    Builds a hashable key for a function call.
+
+    Arguments are first bound to the function's signature with defaults
+    applied, so f(x, 5), f(x, n=5) and (if 5 is the default) f(x) share a
+    key. Array arguments are represented by their content hash, everything
+    else by value.
+
+    Args:
+        func (callable): The function being called.
+        args (tuple): Positional arguments.
+        kwargs (dict): Keyword arguments.
+
+    Returns:
+        tuple: Hashable key.
+    """
+    kwargs = kwargs or {}
+    signature = _signature(func)
+    if signature is not None:
+        try:
+            bound = signature.bind(*args, **kwargs)
+        except TypeError:
+            # Leave the mismatch for the call itself to report.
+            pass
+        else:
+            bound.apply_defaults()
+            args, kwargs = bound.args, bound.kwargs
+    return (
+        func.__module__,
+        func.__qualname__,
+        tuple(_key_part(a) for a in args),
+        tuple(sorted((k, _key_part(v)) for k, v in kwargs.items())),
+    )
+
+def cached(func=None, cache=None, persist=False, disk_cache=None):
+    """
+    Decorator that memoizes a DSP function in a ResultCache.
+
+    Array arguments are keyed by their content hash, all other arguments by
+    value, so calling again with the same signal and parameters returns the
+    stored (read-only) result instead of recomputing it. With persist the
+    result is also kept in a DiskCache, so it survives restarts and is
+    found by other sessions and processes that load the same audio.
+
+    Args:
+        func (callable): Function to wrap.
+        cache (ResultCache): Cache to use (default: the shared default_cache).
+        persist (bool): Also look up and store results on disk.
+        disk_cache (DiskCache): Disk store to use (default: the shared
+            default_disk_cache).
+    """
+    if func is None:
+        return functools.partial(cached, cache=cache, persist=persist, disk_cache=disk_cache)
+
+    series = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        store = default_cache if cache is None else cache
+        disk = default_disk_cache if disk_cache is None else disk_cache
+        key = call_key(func, args, kwargs)
+        result = store.get(key)
+        if result is None and persist:
+            result = disk.get(key)
+            if result is not None:
+                store.put(key, result)
+        if metrics.enabled:
+            metrics.count_cache(series, result is not None)
+        if result is None:
+            inputs = [a for a in list(args) + list(kwargs.values()) if isinstance(a, np.ndarray)]
+            result = store.put(key, _freeze(func(*args, **kwargs), inputs))
+            if persist and not _aliases(result, inputs):
+                disk.put(key, result)
+        return result
+
+    return wrapper
@@ -0,0 +1,57 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from core.metrics import timed
+
+def channel_count(signal, axis=0):
+    """
+    Returns:
+        int: Number of channels of an array whose time axis is axis.
+    """
+    if np.ndim(signal) < 2:
+        return 1
+    return int(np.prod(np.delete(np.shape(signal), axis % np.ndim(signal))))
+
+@timed
+def map_channels(func, signal, axis=0, workers=1):
+    """
+    Applies a vectorized function to groups of channels in parallel.
+
+    func must accept an array with the same layout as signal (time along
+    axis) and return one with the same number of channels. The channels are
+    split into at most `workers` contiguous groups, each group is processed
+    by one vectorized call on a thread, and the results are joined again.
+    The scipy kernels used by the core functions release the GIL, so the
+    groups run concurrently.
+
+    Args:
+        func (callable): Function of one array.
+        signal (np.array): Input of shape (samples,) or (samples, channels)
+            (time along axis; the channel axis is the last non-time axis).
+        axis (int): Time axis.
+        workers (int): Thread count (1 = a single call, -1 or None = one per CPU).
+
+    Returns:
+        np.array: Output of func, joined along the channel axis.
+    """
+    if workers is None or workers < 0:
+        workers = os.cpu_count() or 1
+    if signal.ndim < 2 or workers == 1:
+        return func(signal)
+
+    channel_axis = signal.ndim - 1 if axis % signal.ndim != signal.ndim - 1 else signal.ndim - 2
+    n_channels = signal.shape[channel_axis]
+    n_groups = min(workers, n_channels)
+    if n_groups <= 1:
+        return func(signal)
+
+    bounds = np.linspace(0, n_channels, n_groups + 1).astype(int)
+    index = [slice(None)] * signal.ndim
+    groups = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        index[channel_axis] = slice(start, stop)
+        groups.append(signal[tuple(index)])
+
+    with ThreadPoolExecutor(max_workers=n_groups, thread_name_prefix='dsp-channels') as pool:
+        results = list(pool.map(func, groups))
+    return np.concatenate(results, axis=channel_axis)
@@ -1,42 +1,621 @@
+import functools
+import os
 import numpy as np
-from scipy.fft import rfft, rfftfreq
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import rfft, rfftfreq, next_fast_len
+from scipy.signal import peak_prominences
+from core.cache import cached
+from core.metrics import timed
+from core.signal_filters import iter_blocks
 
-def compute_fft(signal, fs, window_type='None', scale='Linear'):
+# Windows up to this length (STFT frames, filter kernels) are cached;
+# longer ones, such as a window over a whole signal, are built per call so
+# the cache does not keep them alive.
+WINDOW_CACHE_MAX_LEN = 65536
+
+def get_window_array(window_type, n, sym=True):
+    """
+    Returns a read-only window of length n, cached if n is at most
+    WINDOW_CACHE_MAX_LEN.
+
+    Args:
+        window_type (str): Window function ('None', 'Hann', 'Hamming', or
+            'Sqrt Hann' for analysis-synthesis pairs).
+        n (int): Window length.
+        sym (bool): Symmetric window (for single transforms) or periodic
+            window (for overlapping frames).
+
+    Returns:
+        np.array: Window samples.
+    """
+    if n <= WINDOW_CACHE_MAX_LEN:
+        return _cached_window(window_type, n, sym)
+    return _make_window(window_type, n, sym)
+
+def _make_window(window_type, n, sym):
+    m = n if sym else n + 1
+    if window_type == 'Hann':
+        window = np.hanning(m)
+    elif window_type == 'Sqrt Hann':
+        window = np.sqrt(np.hanning(m))
+    elif window_type == 'Hamming':
+        window = np.hamming(m)
+    else:
+        window = np.ones(m)
+    window = window[:n]
+    window.flags.writeable = False
+    return window
+
+_cached_window = functools.lru_cache(maxsize=32)(_make_window)
+
+class FFTPlan:
+    """
+    Transform size and threading chosen for a real FFT of n samples.
+
+    Attributes:
+        n (int): Number of signal samples.
+        nfft (int): Transform length; samples beyond n are zeros.
+        workers (int): Worker threads passed to scipy.fft (-1 = all cores).
+    """
+
+    def __init__(self, n, nfft, workers=-1):
+        if nfft < n:
+            raise ValueError(f"nfft ({nfft}) must be at least the signal length ({n})")
+        self.n = n
+        self.nfft = nfft
+        self.workers = workers
+
+    @property
+    def padding(self):
+        return self.nfft - self.n
+
+    @property
+    def threads(self):
+        return (os.cpu_count() or 1) if self.workers < 0 else self.workers
+
+    def describe(self):
+        """
+        Returns:
+            str: Human-readable summary, e.g. for a caption under a plot.
+        """
+        if self.padding:
+            size = f"{self.n:,} samples zero-padded to {self.nfft:,}"
+        else:
+            size = f"{self.nfft:,} samples"
+        return f"{size}, {self.threads} thread(s)"
+
+    def __repr__(self):
+        return f"FFTPlan(n={self.n}, nfft={self.nfft}, workers={self.workers})"
+
+@functools.lru_cache(maxsize=128)
+def plan_fft(n, nfft='fast', workers=-1):
+    """
+    Chooses the transform length for a real FFT of n samples.
+
+    FFT cost depends on the prime factors of the length: a length with a
+    large prime factor can be orders of magnitude slower than a nearby
+    5-smooth one. Plans are memoized; scipy.fft keeps its own cache of
+    twiddle factors per length, so reusing a plan's nfft reuses those too.
+
+    Args:
+        n (int): Number of signal samples.
+        nfft (str or int): 'fast' pads to the next fast length
+            (scipy.fft.next_fast_len), 'exact' transforms n samples as they
+            are, an int gives the padded length explicitly.
+        workers (int): Worker threads for scipy.fft (-1 = all cores).
+
+    Returns:
+        FFTPlan: The chosen plan.
+    """
+    if nfft == 'fast':
+        nfft = next_fast_len(n, real=True) if n > 0 else 0
+    elif nfft == 'exact':
+        nfft = n
+    return FFTPlan(n, int(nfft), workers)
+
+@timed
+def compute_fft(signal, fs, window_type='None', scale='Linear', nfft='exact', workers=-1, return_plan=False, axis=0):
     """
     Computes the FFT of the signal.
+
+    The window covers the signal samples only; zero-padding up to the plan's
+    nfft is appended after windowing. Padding interpolates the spectrum onto
+    a finer grid (bin spacing fs / nfft) without changing its shape, and
+    magnitudes stay normalized by the signal length. The default is an
+    unpadded DFT; pass nfft='fast' to pad to a fast length. A tone between
+    bins may then land on a different bin than without padding; use a
+    window to keep that scalloping small.
     
     Args:
         signal (np.array): Input signal.
         fs (int): Sampling rate.
         window_type (str): Window function ('None', 'Hann', 'Hamming').
         scale (str): Magnitude scale ('Linear', 'Log').
+        nfft (str or int): Transform length, see plan_fft ('fast', 'exact' or an int).
+        workers (int): Worker threads for scipy.fft (-1 = all cores).
+        return_plan (bool): Also return the FFTPlan that was used.
+        axis (int): Time axis. A (samples, channels) array is transformed
+            in one call, with the channels spread over the workers.
         
     Returns:
         np.array: Frequency axis (positive half).
-        np.array: Magnitude spectrum (positive half).
-        np.array: Phase spectrum (positive half).
+        np.array: Magnitude spectrum (positive half), bins along axis.
+        np.array: Phase spectrum (positive half), bins along axis.
+        FFTPlan: The plan used (only if return_plan is True).
     """
-    N = len(signal)
+    signal = np.asarray(signal)
+    N = signal.shape[axis] if signal.ndim else 0
+    plan = plan_fft(N, nfft, workers)
     
-    if window_type == 'Hann':
-        window = np.hanning(N)
-        signal = signal * window
-    elif window_type == 'Hamming':
-        window = np.hamming(N)
-        signal = signal * window
-        
-    yf = rfft(signal)
-    xf = rfftfreq(N, 1/fs)
-    
-    freqs = xf
+    if window_type in ('Hann', 'Hamming'):
+        shape = [1] * signal.ndim
+        shape[axis] = N
+        signal = np.multiply(signal, get_window_array(window_type, N).reshape(shape))
+        yf = rfft(signal, n=plan.nfft, axis=axis, workers=workers, overwrite_x=True)
+    else:
+        yf = rfft(signal, n=plan.nfft, axis=axis, workers=workers)
+    freqs = rfftfreq(plan.nfft, 1/fs)
     
     magnitude = np.abs(yf)
     
-    magnitude = magnitude / N
+    magnitude /= max(N, 1)
     
     if scale == 'Log':
         magnitude = 20 * np.log10(magnitude + 1e-10)
         
     phase = np.angle(yf)
     
+    if return_plan:
+        return freqs, magnitude, phase, plan
     return freqs, magnitude, phase
+
+cached_compute_fft = cached(compute_fft, persist=True)
+
+class STFTFramer:
+    """
+    Push-style framing and transform for the STFT.
+
+    Samples are pushed in arbitrary chunks; the framer carries the partial
+    frame between pushes and transforms complete frames in batches. Frames
+    are strided views into the buffered samples (no copies). A push holds
+    the spectra of every frame it completes, so callers with a whole signal
+    push it in chunks of about batch_samples.
+    """
+
+    def __init__(self, fs, nperseg=2048, noverlap=None, window_type='Hann', batch_frames=256, workers=-1):
+        if noverlap is None:
+            noverlap = nperseg // 2
+        self.hop = nperseg - noverlap
+        if self.hop <= 0:
+            raise ValueError("noverlap must be smaller than nperseg")
+        self.fs = fs
+        self.nperseg = nperseg
+        self.batch_frames = batch_frames
+        self.workers = workers
+        self.window = get_window_array(window_type, nperseg, sym=False)
+        self._buf = np.zeros(0)
+        self._frame_index = 0
+        self._skip = 0
+
+    @property
+    def batch_samples(self):
+        """
+        int: Samples that complete one batch of frames.
+        """
+        return self.batch_frames * self.hop
+
+    def push(self, block):
+        """
+        Adds samples and transforms every frame they complete.
+
+        The framer's state is updated before push returns, whether or not
+        the result is used.
+
+        Returns:
+            list: (times, spectra) per batch of at most batch_frames frames,
+                with frame centre times in seconds, shape (n,), and complex
+                spectra, shape (n, nperseg // 2 + 1).
+        """
+        nperseg, hop = self.nperseg, self.hop
+        if self._skip:
+            dropped = min(self._skip, len(block))
+            block = block[dropped:]
+            self._skip -= dropped
+        buf = block if len(self._buf) == 0 else np.concatenate([self._buf, block])
+        if len(buf) < nperseg:
+            self._buf = buf
+            return []
+
+        frames = sliding_window_view(buf, nperseg)[::hop]
+        n_frames = len(frames)
+        consumed = n_frames * hop
+        self._skip = max(consumed - len(buf), 0)
+        # Copy the leftover: the caller may reuse its block buffer.
+        self._buf = buf[consumed:].copy()
+        first = self._frame_index
+        self._frame_index += n_frames
+
+        batches = []
+        for start in range(0, n_frames, self.batch_frames):
+            batch = frames[start:start + self.batch_frames]
+            spectra = rfft(batch * self.window, axis=-1, workers=self.workers)
+            idx = first + start + np.arange(len(batch))
+            times = (idx * hop + nperseg / 2) / self.fs
+            batches.append((times, spectra))
+        return batches
+
+def iter_stft(blocks, fs, nperseg=2048, noverlap=None, window_type='Hann', batch_frames=256, workers=-1):
+    """
+    Streaming short-time Fourier transform.
+
+    Frames are strided views into the incoming samples (no copies) and are
+    transformed in batches of `batch_frames` rows, so memory stays bounded
+    by the batch size regardless of signal length. Samples left over at the
+    end that do not fill a whole frame are dropped.
+
+    Args:
+        blocks (np.array or iterable): Whole signal, or consecutive chunks of it
+            (e.g. AudioSource.blocks()).
+        fs (int): Sampling rate.
+        nperseg (int): Frame length in samples.
+        noverlap (int): Overlap between frames (default: nperseg // 2).
+        window_type (str): Window function ('None', 'Hann', 'Hamming').
+        batch_frames (int): Number of frames transformed per rfft call.
+        workers (int): Worker threads for scipy.fft (-1 = all cores).
+
+    Yields:
+        np.array: Frame centre times in seconds, shape (n,).
+        np.array: Complex spectra, shape (n, nperseg // 2 + 1).
+    """
+    framer = STFTFramer(fs, nperseg, noverlap, window_type, batch_frames, workers)
+
+    if isinstance(blocks, np.ndarray):
+        blocks = iter_blocks(blocks, framer.batch_samples)
+
+    for block in blocks:
+        yield from framer.push(block)
+
+def _bounded_hop(n, nperseg, hop, max_frames):
+    """
+    Widens the hop so a signal of n samples yields at most max_frames frames.
+    """
+    if max_frames and n > nperseg:
+        hop = max(hop, int(np.ceil((n - nperseg) / max(max_frames - 1, 1))))
+    return hop
+
+@timed
+def compute_stft(signal, fs, nperseg=2048, noverlap=None, window_type='Hann', scale='Linear',
+                 max_frames=None, batch_frames=256, workers=-1):
+    """
+    Computes a magnitude spectrogram of the signal.
+
+    Args:
+        signal (np.array): Input signal.
+        fs (int): Sampling rate.
+        nperseg (int): Frame length in samples.
+        noverlap (int): Overlap between frames (default: nperseg // 2).
+        window_type (str): Window function ('None', 'Hann', 'Hamming').
+        scale (str): Magnitude scale ('Linear', 'Log').
+        max_frames (int): Upper bound on the number of frames. The hop is
+            widened when needed, so the output size does not grow with the
+            signal length.
+        batch_frames (int): Number of frames transformed per rfft call.
+        workers (int): Worker threads for scipy.fft (-1 = all cores).
+
+    Returns:
+        np.array: Frequency axis, shape (nperseg // 2 + 1,).
+        np.array: Frame centre times in seconds, shape (n_frames,).
+        np.array: float32 magnitude, shape (n_frames, nperseg // 2 + 1).
+    """
+    if noverlap is None:
+        noverlap = nperseg // 2
+    n = len(signal)
+    hop = _bounded_hop(n, nperseg, nperseg - noverlap, max_frames)
+
+    n_frames = (n - nperseg) // hop + 1 if n >= nperseg else 0
+    freqs = rfftfreq(nperseg, 1/fs)
+    times = np.zeros(n_frames)
+    magnitude = np.zeros((n_frames, len(freqs)), dtype=np.float32)
+
+    pos = 0
+    for t, spectra in iter_stft(signal, fs, nperseg, nperseg - hop, window_type, batch_frames, workers):
+        magnitude[pos:pos + len(t)] = np.abs(spectra)
+        times[pos:pos + len(t)] = t
+        pos += len(t)
+
+    magnitude /= nperseg
+
+    if scale == 'Log':
+        magnitude = 20 * np.log10(magnitude + 1e-10)
+
+    return freqs, times, magnitude
+
+cached_compute_stft = cached(compute_stft, persist=True)
+
+@timed
+def compute_welch(signal, fs, nperseg=4096, noverlap=None, window_type='Hann', scale='Linear',
+                  batch_frames=256, workers=-1):
+    """
+    Computes an averaged (Welch) magnitude spectrum of the signal.
+
+    The signal is split into overlapping windowed segments whose power
+    spectra are averaged. Segments are produced incrementally, so the cost
+    is O(N) time and O(nperseg) memory and the result always has
+    nperseg // 2 + 1 bins, however long the input is. Magnitudes are
+    normalized like compute_fft, so a steady tone reads the same in both.
+
+    Args:
+        signal (np.array or iterable): Whole signal, or consecutive chunks of it
+            (e.g. AudioSource.blocks()).
+        fs (int): Sampling rate.
+        nperseg (int): Segment length in samples.
+        noverlap (int): Overlap between segments (default: nperseg // 2).
+        window_type (str): Window function ('None', 'Hann', 'Hamming').
+        scale (str): Magnitude scale ('Linear', 'Log').
+        batch_frames (int): Number of segments transformed per rfft call.
+        workers (int): Worker threads for scipy.fft (-1 = all cores).
+
+    Returns:
+        np.array: Frequency axis, shape (nperseg // 2 + 1,).
+        np.array: Averaged magnitude spectrum, shape (nperseg // 2 + 1,).
+    """
+    if isinstance(signal, np.ndarray) and 0 < len(signal) < nperseg:
+        nperseg = len(signal)
+        noverlap = None
+
+    power = np.zeros(nperseg // 2 + 1)
+    count = 0
+    for _, spectra in iter_stft(signal, fs, nperseg, noverlap, window_type, batch_frames, workers):
+        power += np.sum(spectra.real ** 2 + spectra.imag ** 2, axis=0)
+        count += len(spectra)
+
+    freqs = rfftfreq(nperseg, 1/fs)
+    magnitude = np.sqrt(power / max(count, 1)) / nperseg
+
+    if scale == 'Log':
+        magnitude = 20 * np.log10(magnitude + 1e-10)
+
+    return freqs, magnitude
+
+cached_compute_welch = cached(compute_welch, persist=True)
+
+@timed
+def estimate_bandwidth(signal, fs, nperseg=4096, threshold=0.01, power_fraction=0.99):
+    """
+    Estimates the bandwidth of the signal from its averaged spectrum.
+
+    Works on the Welch spectrum (see compute_welch), so it runs in one pass
+    with O(nperseg) memory, and averaging over segments keeps isolated noise
+    spikes from pushing the estimate up the way a single full-length FFT does.
+
+    Args:
+        signal (np.array or iterable): Whole signal, or consecutive chunks of it.
+        fs (int): Sampling rate.
+        nperseg (int): Segment length in samples.
+        threshold (float): Fraction of the peak magnitude a bin must exceed
+            to count as significant.
+        power_fraction (float): Share of the total power the occupied
+            bandwidth must contain.
+
+    Returns:
+        float: Highest frequency whose averaged magnitude exceeds threshold x peak.
+        float: Occupied bandwidth, the frequency below which power_fraction
+            of the signal power lies.
+    """
+    freqs, magnitude = compute_welch(signal, fs, nperseg=nperseg, window_type='Hann')
+    if len(magnitude) == 0 or not np.any(magnitude > 0):
+        return 0.0, 0.0
+
+    significant = np.flatnonzero(magnitude > threshold * np.max(magnitude))
+    f_max = float(freqs[significant[-1]]) if len(significant) else 0.0
+
+    cumulative = np.cumsum(magnitude ** 2)
+    occupied = float(freqs[np.searchsorted(cumulative, power_fraction * cumulative[-1])])
+    return f_max, occupied
+
+cached_estimate_bandwidth = cached(estimate_bandwidth, persist=True)
+
+def _parabolic(left, centre, right):
+    """
+    Fits a parabola through three equally spaced points around a maximum.
+
+    Returns:
+        np.array: Offset of the vertex from the centre point, in bins (-0.5 to 0.5).
+        np.array: Value at the vertex.
+    """
+    denom = left - 2 * centre + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(denom < 0, 0.5 * (left - right) / denom, 0.0)
+    offset = np.clip(offset, -0.5, 0.5)
+    return offset, centre - 0.25 * (left - right) * offset
+
+def _to_db(magnitude, scale):
+    if scale == 'Log':
+        return np.asarray(magnitude, dtype=np.float64)
+    return 20 * np.log10(np.asarray(magnitude, dtype=np.float64) + 1e-10)
+
+@timed
+def spectral_peaks(magnitude, freqs, k=5, scale='Linear', min_prominence=6.0, min_distance=1):
+    """
+    Finds the k strongest distinct peaks of a magnitude spectrum.
+
+    Only local maxima are considered, so the neighbouring bins of one tone
+    cannot crowd out other peaks. The strongest candidates are selected
+    with argpartition (linear time), filtered by prominence and spacing,
+    and refined to sub-bin accuracy by fitting a parabola to the dB
+    magnitudes around each peak (exact for a Gaussian-shaped main lobe,
+    close for Hann/Hamming windows).
+
+    Args:
+        magnitude (np.array): Magnitude spectrum.
+        freqs (np.array): Frequency of each bin (uniformly spaced).
+        k (int): Maximum number of peaks.
+        scale (str): Scale of magnitude ('Linear', 'Log'); returned
+            magnitudes use the same scale.
+        min_prominence (float): Minimum height in dB of a peak above the
+            higher of the two valleys separating it from taller peaks.
+        min_distance (int): Minimum spacing between peaks in bins.
+
+    Returns:
+        np.array: Interpolated peak frequencies, strongest first.
+        np.array: Interpolated peak magnitudes.
+        np.array: Bin index of each peak.
+    """
+    db = _to_db(magnitude, scale)
+    n = len(db)
+    if n < 3 or k <= 0:
+        return np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.intp)
+
+    centre = db[1:-1]
+    is_max = (centre > db[:-2]) & (centre >= db[2:])
+    candidates = np.flatnonzero(is_max) + 1
+
+    # Look at a few more candidates than needed: some fail the filters below.
+    n_keep = min(len(candidates), max(4 * k, 32))
+    if n_keep < len(candidates):
+        top = np.argpartition(db[candidates], -n_keep)[-n_keep:]
+        candidates = candidates[top]
+    candidates = candidates[np.argsort(db[candidates])[::-1]]
+
+    if min_prominence > 0 and len(candidates):
+        prominences = peak_prominences(db, candidates)[0]
+        candidates = candidates[prominences >= min_prominence]
+
+    selected = []
+    for idx in candidates:
+        if all(abs(idx - other) >= min_distance for other in selected):
+            selected.append(idx)
+            if len(selected) == k:
+                break
+    peaks = np.array(selected, dtype=np.intp)
+
+    offset, peak_db = _parabolic(db[peaks - 1], db[peaks], db[peaks + 1])
+    df = freqs[1] - freqs[0]
+    peak_freqs = freqs[peaks] + offset * df
+    peak_mags = peak_db if scale == 'Log' else 10 ** (peak_db / 20)
+    return peak_freqs, peak_mags, peaks
+
+def _frame_peaks(db, freqs, k, floor_db):
+    """
+    Vectorized top-k local maxima of each row of a dB spectrogram.
+    """
+    n_frames, n_bins = db.shape
+    peak_freqs = np.full((n_frames, k), np.nan)
+    peak_db = np.full((n_frames, k), np.nan)
+    if n_bins < 3 or n_frames == 0:
+        return peak_freqs, peak_db
+
+    centre = db[:, 1:-1]
+    is_max = (centre > db[:, :-2]) & (centre >= db[:, 2:])
+    is_max &= centre >= np.max(db, axis=1, keepdims=True) - floor_db
+    scores = np.where(is_max, centre, -np.inf)
+
+    k_eff = min(k, scores.shape[1])
+    top = np.argpartition(scores, -k_eff, axis=1)[:, -k_eff:]
+    order = np.argsort(np.take_along_axis(scores, top, axis=1), axis=1)[:, ::-1]
+    top = np.take_along_axis(top, order, axis=1) + 1
+    valid = np.isfinite(np.take_along_axis(scores, top - 1, axis=1))
+
+    left = np.take_along_axis(db, top - 1, axis=1)
+    mid = np.take_along_axis(db, top, axis=1)
+    right = np.take_along_axis(db, top + 1, axis=1)
+    offset, values = _parabolic(left, mid, right)
+    df = freqs[1] - freqs[0]
+    peak_freqs[:, :k_eff] = np.where(valid, freqs[top] + offset * df, np.nan)
+    peak_db[:, :k_eff] = np.where(valid, values, np.nan)
+    return peak_freqs, peak_db
+
+class PeakTracker:
+    """
+    Streaming dominant-frequency tracker built on STFTFramer.
+
+    Every STFT frame is reduced to its k strongest local maxima with
+    parabolic refinement. The work per frame is linear in the number of
+    bins (argpartition, no sort of the spectrum) and only the peak tables
+    are kept, so long signals can be tracked block by block.
+    """
+
+    def __init__(self, fs, nperseg=2048, noverlap=None, window_type='Hann', k=1, floor_db=60.0,
+                 batch_frames=256, workers=-1):
+        """
+        Args:
+            fs (int): Sampling rate.
+            nperseg (int): Frame length in samples.
+            noverlap (int): Overlap between frames (default: nperseg // 2).
+            window_type (str): Window function ('None', 'Hann', 'Hamming').
+            k (int): Peaks reported per frame.
+            floor_db (float): Peaks more than this far below the frame's
+                maximum are reported as NaN.
+            batch_frames (int): Number of frames transformed per rfft call.
+            workers (int): Worker threads for scipy.fft (-1 = all cores).
+        """
+        self.k = k
+        self.floor_db = floor_db
+        self.nperseg = nperseg
+        self.freqs = rfftfreq(nperseg, 1/fs)
+        self._framer = STFTFramer(fs, nperseg, noverlap, window_type, batch_frames, workers)
+
+    def push(self, block):
+        """
+        Adds samples and tracks every frame they complete.
+
+        Returns:
+            list: (times, peak_freqs, peak_db) per batch of frames, with frame
+                centre times in seconds, shape (n,), peak frequencies, shape
+                (n, k), NaN where no peak, and peak magnitudes in dB, shape
+                (n, k).
+        """
+        tracked = []
+        for times, spectra in self._framer.push(block):
+            db = 20 * np.log10(np.abs(spectra) / self.nperseg + 1e-10)
+            peak_freqs, peak_db = _frame_peaks(db, self.freqs, self.k, self.floor_db)
+            tracked.append((times, peak_freqs, peak_db))
+        return tracked
+
+@timed
+def track_peaks(signal, fs, nperseg=2048, noverlap=None, window_type='Hann', k=1, floor_db=60.0,
+                max_frames=None, batch_frames=256, workers=-1):
+    """
+    Tracks the dominant frequencies of the signal over time.
+
+    Args:
+        signal (np.array or iterable): Whole signal, or consecutive chunks of it
+            (e.g. AudioSource.blocks()).
+        fs (int): Sampling rate.
+        nperseg (int): Frame length in samples.
+        noverlap (int): Overlap between frames (default: nperseg // 2).
+        window_type (str): Window function ('None', 'Hann', 'Hamming').
+        k (int): Peaks reported per frame.
+        floor_db (float): Peaks more than this far below the frame's maximum
+            are reported as NaN.
+        max_frames (int): Upper bound on the number of frames (arrays only),
+            as in compute_stft.
+        batch_frames (int): Number of frames transformed per rfft call.
+        workers (int): Worker threads for scipy.fft (-1 = all cores).
+
+    Returns:
+        np.array: Frame centre times in seconds, shape (n_frames,).
+        np.array: Peak frequencies, shape (n_frames, k), strongest first.
+        np.array: Peak magnitudes in dB, shape (n_frames, k).
+    """
+    if noverlap is None:
+        noverlap = nperseg // 2
+    if isinstance(signal, np.ndarray):
+        hop = _bounded_hop(len(signal), nperseg, nperseg - noverlap, max_frames)
+        noverlap = nperseg - hop
+
+    tracker = PeakTracker(fs, nperseg, noverlap, window_type, k, floor_db, batch_frames, workers)
+    if isinstance(signal, np.ndarray):
+        signal = iter_blocks(signal, tracker._framer.batch_samples)
+    times, peak_freqs, peak_db = [], [], []
+    for block in signal:
+        for t, f, m in tracker.push(block):
+            times.append(t)
+            peak_freqs.append(f)
+            peak_db.append(m)
+
+    if not times:
+        return np.zeros(0), np.zeros((0, k)), np.zeros((0, k))
+    return np.concatenate(times), np.concatenate(peak_freqs), np.concatenate(peak_db)
+
+cached_track_peaks = cached(track_peaks, persist=True)
@@ -0,0 +1,164 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from core.cache import call_key
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job when a newer request has superseded it.
+    """
+
+class Job:
+    """
+    A unit of background work made of named stages.
+
+    Each stage is a callable that receives the dict of results produced by
+    the stages before it. Cancellation is cooperative: it takes effect at
+    the next stage boundary (or immediately if the job has not started).
+    """
+
+    def __init__(self, key, stages):
+        self.key = key
+        self.stages = list(stages)
+        self.results = {}
+        self.stage = None
+        self.completed = 0
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def progress(self):
+        """
+        Fraction of stages completed, between 0 and 1.
+        """
+        return self.completed / len(self.stages) if self.stages else 1.0
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def result(self, timeout=None):
+        """
+        Waits for the job and returns its results dict.
+
+        Raises:
+            JobCancelled: If the job was superseded before finishing.
+        """
+        try:
+            return self.future.result(timeout)
+        except CancelledError:
+            raise JobCancelled(self.key)
+
+    def _run(self):
+        for name, fn in self.stages:
+            if self._cancel.is_set():
+                raise JobCancelled(self.key)
+            self.stage = name
+            self.results[name] = fn(self.results)
+            self.completed += 1
+        self.stage = None
+        return self.results
+
+class JobRunner:
+    """
+    Runs DSP jobs on a thread pool.
+
+    - Identical requests (same key) share one job, whether it is still
+      running or recently finished.
+    - Jobs are submitted to a slot (e.g. one per page per session); a new
+      job in a slot cancels the previous one, so only the latest parameter
+      set runs to completion.
+
+    Threads are used rather than processes: the heavy numpy/scipy kernels
+    release the GIL, and the memory-mapped audio does not have to be
+    copied into worker processes.
+    """
+
+    def __init__(self, max_workers=None, keep_finished=16):
+        """
+        Args:
+            max_workers (int): Pool size (default: min(4, CPU count)).
+            keep_finished (int): Number of finished jobs kept for reuse.
+        """
+        if max_workers is None:
+            max_workers = min(4, os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dsp-job')
+        self._jobs = OrderedDict()
+        # Weak: a slot only needs its job while the job is queued or running
+        # (the executor holds it) or kept as finished in _jobs, so sessions
+        # that went away do not keep their last results alive.
+        self._slots = weakref.WeakValueDictionary()
+        self._keep_finished = keep_finished
+        # Re-entrant: a done-callback runs inline when the job finished first.
+        self._lock = threading.RLock()
+
+    def submit(self, key, stages, slot=None):
+        """
+        Starts (or reuses) a job.
+
+        Args:
+            key (hashable): Identity of the request, e.g. built with call_key.
+            stages (list): (name, callable) pairs run in order; each callable
+                receives the results of the previous stages.
+            slot (hashable): Supersession group. Submitting a different key
+                to the same slot cancels the job currently held there.
+
+        Returns:
+            Job: The running or finished job for this key.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and (job.cancelled or (job.done() and job.future.exception() is not None)):
+                del self._jobs[key]
+                job = None
+
+            if job is None:
+                job = Job(key, stages)
+                job.future = self._executor.submit(job._run)
+                job.future.add_done_callback(lambda _f, key=key: self._finished(key))
+                self._jobs[key] = job
+            else:
+                self._jobs.move_to_end(key)
+
+            if slot is not None:
+                previous = self._slots.get(slot)
+                self._slots[slot] = job
+                if (previous is not None and previous is not job and not previous.done()
+                        and all(held is not previous for held in self._slots.values())):
+                    previous.cancel()
+
+            return job
+
+    def run(self, fn, *args, slot=None, **kwargs):
+        """
+        Submits a single function call as a one-stage job keyed by its arguments.
+        """
+        key = call_key(fn, args, kwargs)
+        return self.submit(key, [(fn.__name__, lambda _results: fn(*args, **kwargs))], slot=slot)
+
+    def _finished(self, key):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.cancelled:
+                del self._jobs[key]
+            finished = [k for k, j in self._jobs.items() if j.done()]
+            for k in finished[:max(len(finished) - self._keep_finished, 0)]:
+                del self._jobs[k]
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+        self._executor.shutdown(wait=wait)
+
+default_runner = JobRunner()
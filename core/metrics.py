@@ -0,0 +1,248 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import numpy as np
+
+class MetricsRegistry:
+    """
+    In-process store of wall time, input size, allocation and cache
+    counters for instrumented calls.
+
+    Series are keyed by dotted name: core functions use their module and
+    qualified name (e.g. 'core.frequency_analysis.compute_fft'), UI stages
+    a name such as 'interface.fft_tab.spectrogram_chart'. While disabled,
+    instrumented code only reads `enabled` and runs unchanged.
+
+    Allocation tracking uses tracemalloc and reports, per call, the peak
+    traced memory above what was allocated when the call started. It slows
+    every allocation down, so it is off unless asked for. tracemalloc is
+    process-wide, so calls running concurrently on other threads are
+    counted in each other's peaks.
+    """
+
+    def __init__(self, enabled=False, track_allocations=False):
+        """
+        Args:
+            enabled (bool): Record from the start.
+            track_allocations (bool): Also record peak allocations.
+        """
+        self.enabled = False
+        self.track_allocations = False
+        self._started_tracemalloc = False
+        self._series = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if enabled:
+            self.enable(track_allocations)
+
+    def enable(self, track_allocations=False):
+        if track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        elif not track_allocations and self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self.track_allocations = track_allocations
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self.track_allocations = False
+
+    def _entry(self, name):
+        entry = self._series.get(name)
+        if entry is None:
+            entry = self._series[name] = {
+                'calls': 0,
+                'seconds_total': 0.0,
+                'seconds_max': 0.0,
+                'seconds_last': 0.0,
+                'input_bytes_total': 0,
+                'alloc_peak_bytes': None,
+                'cache_hits': 0,
+                'cache_misses': 0,
+            }
+        return entry
+
+    def record(self, name, seconds, input_bytes=0, alloc_bytes=None):
+        """
+        Adds one call to a series.
+
+        Args:
+            name (str): Series name.
+            seconds (float): Wall time of the call.
+            input_bytes (int): Size of the array inputs.
+            alloc_bytes (int): Peak allocation during the call, if tracked.
+        """
+        with self._lock:
+            entry = self._entry(name)
+            entry['calls'] += 1
+            entry['seconds_total'] += seconds
+            entry['seconds_max'] = max(entry['seconds_max'], seconds)
+            entry['seconds_last'] = seconds
+            entry['input_bytes_total'] += input_bytes
+            if alloc_bytes is not None:
+                entry['alloc_peak_bytes'] = max(entry['alloc_peak_bytes'] or 0, alloc_bytes)
+
+    def count_cache(self, name, hit):
+        with self._lock:
+            self._entry(name)['cache_hits' if hit else 'cache_misses'] += 1
+
+    def _alloc_enter(self):
+        if not (self.track_allocations and tracemalloc.is_tracing()):
+            return False
+        stack = self._local.__dict__.setdefault('stack', [])
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            # The peak is reset for the nested call; keep the enclosing
+            # call's peak so far.
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        stack.append([current, 0])
+        return True
+
+    def _alloc_exit(self):
+        stack = self._local.stack
+        start, child_peak = stack.pop()
+        peak = child_peak
+        if tracemalloc.is_tracing():
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        return max(peak - start, 0)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Series name -> copy of its counters.
+        """
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def to_json(self, indent=2):
+        """
+        Returns:
+            str: The snapshot as JSON.
+        """
+        return json.dumps(self.snapshot(), indent=indent, sort_keys=True)
+
+    def to_prometheus(self, prefix='dsp'):
+        """
+        Renders the snapshot in the Prometheus text exposition format.
+
+        Args:
+            prefix (str): Metric name prefix.
+
+        Returns:
+            str: One metric family per counter, labelled by series name.
+        """
+        families = [
+            ('calls_total', 'calls', 'counter', "Instrumented calls."),
+            ('seconds_total', 'seconds_total', 'counter', "Wall time spent in the call."),
+            ('seconds_max', 'seconds_max', 'gauge', "Slowest single call."),
+            ('input_bytes_total', 'input_bytes_total', 'counter', "Bytes of array input."),
+            ('alloc_peak_bytes', 'alloc_peak_bytes', 'gauge', "Largest peak allocation of one call."),
+            ('cache_hits_total', 'cache_hits', 'counter', "Results served from the cache."),
+            ('cache_misses_total', 'cache_misses', 'counter', "Results computed on a cache miss."),
+        ]
+        snapshot = self.snapshot()
+        lines = []
+        for suffix, field, kind, help_text in families:
+            metric = f"{prefix}_{suffix}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name in sorted(snapshot):
+                value = snapshot[name][field]
+                if value is None:
+                    continue
+                label = name.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                lines.append(f'{metric}{{name="{label}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+default_registry = MetricsRegistry(
+    enabled=os.environ.get('DSP_METRICS') == '1',
+    track_allocations=os.environ.get('DSP_METRICS_ALLOC') == '1'
+)
+
+def _input_bytes(args, kwargs):
+    total = 0
+    for value in args:
+        if isinstance(value, np.ndarray):
+            total += value.nbytes
+    for value in kwargs.values():
+        if isinstance(value, np.ndarray):
+            total += value.nbytes
+    return total
+
+class _Stage:
+    __slots__ = ('name', 'input_bytes', 'registry', 'active', 'alloc', 'start')
+
+    def __init__(self, name, input_bytes, registry):
+        self.name = name
+        self.input_bytes = input_bytes
+        self.registry = registry
+
+    def __enter__(self):
+        self.active = self.registry.enabled
+        if self.active:
+            self.alloc = self.registry._alloc_enter()
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.active:
+            seconds = time.perf_counter() - self.start
+            alloc_bytes = self.registry._alloc_exit() if self.alloc else None
+            self.registry.record(self.name, seconds, self.input_bytes, alloc_bytes)
+        return False
+
+def stage(name, input_bytes=0, registry=None):
+    """
+    Context manager that times a block of code as one call of `name`.
+
+    Args:
+        name (str): Series name, e.g. 'interface.fft_tab.magnitude_chart'.
+        input_bytes (int): Size of the data the block works on.
+        registry (MetricsRegistry): Registry to record in (default:
+            default_registry).
+    """
+    return _Stage(name, input_bytes, default_registry if registry is None else registry)
+
+def timed(func=None, name=None, registry=None):
+    """
+    Decorator that records every call of a function in the registry.
+
+    The series is named after the function's module and qualified name.
+    Array arguments are summed into input_bytes. While the registry is
+    disabled the wrapper only checks a flag.
+
+    Args:
+        func (callable): Function to wrap.
+        name (str): Series name override.
+        registry (MetricsRegistry): Registry to record in (default:
+            default_registry).
+    """
+    if func is None:
+        return functools.partial(timed, name=name, registry=registry)
+
+    series = name or f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        store = default_registry if registry is None else registry
+        if not store.enabled:
+            return func(*args, **kwargs)
+        with _Stage(series, _input_bytes(args, kwargs), store):
+            return func(*args, **kwargs)
+
+    return wrapper
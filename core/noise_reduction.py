@@ -0,0 +1,346 @@
+import numpy as np
+from scipy.fft import irfft
+from scipy.signal import medfilt
+from core.frequency_analysis import STFTFramer, get_window_array
+from core.signal_filters import iter_blocks
+from core.cache import cached
+from core.channels import map_channels
+from core.metrics import timed
+
+NOISE_METHODS = ('wiener', 'subtraction')
+
+# Minimum statistics: frame powers are smoothed over MIN_STATS_SMOOTH frames
+# and the per-bin minimum is taken over windows of MIN_STATS_WINDOW frames.
+# The minimum of a noisy estimate sits below its mean; MIN_STATS_BIAS undoes
+# that for stationary noise (measured on white noise with these settings).
+MIN_STATS_SMOOTH = 8
+MIN_STATS_WINDOW = 96
+MIN_STATS_BIAS = 2.7
+MIN_STATS_SPREAD = 31
+
+def _framer(fs, nperseg, noverlap, batch_frames, workers):
+    if noverlap is None:
+        noverlap = nperseg // 2
+    if nperseg % (nperseg - noverlap):
+        raise ValueError("nperseg must be a multiple of the hop (nperseg - noverlap)")
+    return STFTFramer(fs, nperseg, noverlap, 'Sqrt Hann', batch_frames, workers)
+
+def _as_blocks(signal, block_size=65536):
+    if isinstance(signal, np.ndarray):
+        return iter_blocks(signal, block_size)
+    return signal
+
+def fit_noise_segment(segment, fs, n_samples, nperseg=2048):
+    """
+    Widens a noise segment to at least one analysis frame.
+
+    A segment shorter than nperseg samples is extended past its end, or
+    moved back from the end of the signal, so estimate_noise_profile has a
+    full frame to average. Longer segments are returned unchanged.
+
+    Args:
+        segment (tuple): (start, end) in seconds.
+        fs (int): Sampling rate.
+        n_samples (int): Length of the signal.
+        nperseg (int): Frame length in samples.
+
+    Returns:
+        tuple: (start, end) in seconds, covering at least nperseg samples.
+    """
+    if n_samples < nperseg:
+        raise ValueError(f"The signal is shorter than one frame ({nperseg / fs:.3f} s)")
+    start, end = (int(round(t * fs)) for t in segment)
+    if end - start >= nperseg:
+        return tuple(segment)
+    start = min(max(start, 0), n_samples)
+    end = min(max(end, start + nperseg), n_samples)
+    start = min(start, end - nperseg)
+    return start / fs, end / fs
+
+@timed
+def estimate_noise_profile(signal, fs, nperseg=2048, noverlap=None, segment=None,
+                           batch_frames=256, workers=-1):
+    """
+    Estimates the noise power spectrum of the signal.
+
+    With a segment, the power spectra of the frames inside it are averaged;
+    pick a stretch that holds only noise. Without one, minimum statistics
+    are used: each bin's smoothed power is tracked over windows of a few
+    seconds and its minimum is taken as the noise floor. That follows noise
+    under continuous speech or music, since every bin drops to the noise
+    level between notes or harmonics. Either way the signal is read once and
+    memory is bounded by a few spectra per window.
+
+    Args:
+        signal (np.array or iterable): Whole signal, or consecutive chunks of it.
+        fs (int): Sampling rate.
+        nperseg (int): Frame length in samples (must match the denoiser).
+        noverlap (int): Overlap between frames (default: nperseg // 2).
+        segment (tuple): Optional (start, end) in seconds of a noise-only stretch.
+        batch_frames (int): Number of frames transformed per rfft call.
+        workers (int): Worker threads for scipy.fft (-1 = all cores).
+
+    Returns:
+        np.array: Noise power per bin, shape (nperseg // 2 + 1,).
+    """
+    framer = _framer(fs, nperseg, noverlap, batch_frames, workers)
+    n_bins = nperseg // 2 + 1
+
+    if segment is not None:
+        start, end = (int(round(t * fs)) for t in segment)
+        if isinstance(signal, np.ndarray):
+            signal = signal[start:end]
+            start, end = 0, len(signal)
+        total = np.zeros(n_bins)
+        count = 0
+        pos = 0
+        for block in _as_blocks(signal):
+            chunk = block[max(start - pos, 0):max(end - pos, 0)]
+            pos += len(block)
+            for _, spectra in framer.push(chunk):
+                total += np.sum(spectra.real ** 2 + spectra.imag ** 2, axis=0)
+                count += len(spectra)
+            if pos >= end:
+                break
+        if count == 0:
+            raise ValueError(f"Noise segment {segment} is shorter than one frame ({nperseg / fs:.3f} s)")
+        return total / count
+
+    minima = []
+    current = None
+    in_window = 0
+    history = np.zeros((0, n_bins))
+    for block in _as_blocks(signal):
+        for _, spectra in framer.push(block):
+            # Moving average over MIN_STATS_SMOOTH frames, carried across batches.
+            stacked = np.concatenate([history, spectra.real ** 2 + spectra.imag ** 2])
+            history = stacked[len(stacked) - (MIN_STATS_SMOOTH - 1):]
+            if len(stacked) < MIN_STATS_SMOOTH:
+                continue
+            csum = np.cumsum(stacked, axis=0)
+            smoothed = csum[MIN_STATS_SMOOTH - 1:].copy()
+            smoothed[1:] -= csum[:-MIN_STATS_SMOOTH]
+            smoothed /= MIN_STATS_SMOOTH
+
+            pos = 0
+            while pos < len(smoothed):
+                part = smoothed[pos:pos + MIN_STATS_WINDOW - in_window]
+                part_min = np.min(part, axis=0)
+                current = part_min if current is None else np.minimum(current, part_min)
+                in_window += len(part)
+                pos += len(part)
+                if in_window == MIN_STATS_WINDOW:
+                    minima.append(current)
+                    current, in_window = None, 0
+
+    if current is not None and (not minima or in_window >= MIN_STATS_WINDOW // 4):
+        minima.append(current)
+    if not minima:
+        return np.zeros(n_bins)
+    profile = MIN_STATS_BIAS * np.median(minima, axis=0)
+    # A steady tone looks like noise to minimum statistics. Noise spectra are
+    # smooth across frequency while tones are narrow, so cap each bin at the
+    # median of its neighbourhood.
+    return np.minimum(profile, medfilt(profile, MIN_STATS_SPREAD))
+
+cached_estimate_noise_profile = cached(estimate_noise_profile, persist=True)
+
+@timed
+def noise_gains(power, noise_power, method='wiener', strength=1.0, floor=0.1):
+    """
+    Computes per-bin suppression gains for a batch of frames.
+
+    Args:
+        power (np.array): Frame power spectra, shape (n_frames, n_bins).
+        noise_power (np.array): Noise power per bin, shape (n_bins,).
+        method (str): 'wiener' (gain = SNR / (1 + SNR)) or 'subtraction'
+            (power spectral subtraction).
+        strength (float): Over-subtraction factor; values above 1 remove
+            more noise at the cost of more musical-noise artifacts.
+        floor (float): Minimum gain, which keeps some residual noise and
+            masks those artifacts.
+
+    Returns:
+        np.array: Gains between floor and 1, same shape as power.
+    """
+    noise = strength * noise_power
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'wiener':
+            snr = np.maximum(power / noise - 1, 0)
+            gains = snr / (1 + snr)
+        elif method == 'subtraction':
+            gains = np.sqrt(np.maximum(1 - noise / power, 0))
+        else:
+            raise ValueError(f"Unknown noise reduction method {method!r}; expected one of {NOISE_METHODS}")
+    gains = np.nan_to_num(gains, nan=1.0)
+    return np.maximum(gains, floor, out=gains)
+
+class SpectralDenoiser:
+    """
+    Streaming STFT-domain noise reduction.
+
+    Frames are analysed with a square-root Hann window, scaled by the
+    gains of noise_gains and resynthesized with the same window by
+    overlap-add, which reconstructs the input exactly when every gain is 1.
+    Frames are processed in batches, and only one batch plus a frame of
+    overlap is held at a time.
+    """
+
+    def __init__(self, fs, noise_power, nperseg=2048, noverlap=None, method='wiener', strength=1.0,
+                 floor=0.1, batch_frames=256, workers=-1):
+        """
+        Args:
+            fs (int): Sampling rate.
+            noise_power (np.array): Noise power per bin (see estimate_noise_profile).
+            nperseg (int): Frame length in samples.
+            noverlap (int): Overlap between frames (default: nperseg // 2).
+            method (str): 'wiener' or 'subtraction'.
+            strength (float): Over-subtraction factor.
+            floor (float): Minimum gain.
+            batch_frames (int): Number of frames transformed per rfft call.
+            workers (int): Worker threads for scipy.fft (-1 = all cores).
+        """
+        self.fs = fs
+        self.noise_power = np.asarray(noise_power, dtype=np.float64)
+        self.nperseg = nperseg
+        self.noverlap = noverlap
+        self.method = method
+        self.strength = strength
+        self.floor = floor
+        self.batch_frames = batch_frames
+        self.workers = workers
+        if len(self.noise_power) != nperseg // 2 + 1:
+            raise ValueError("noise_power must have nperseg // 2 + 1 bins")
+
+        self.window = get_window_array('Sqrt Hann', nperseg, sym=False)
+        self.reset()
+        self.hop = self._stft.hop
+        overlap = nperseg // self.hop
+        # Summed analysis x synthesis window at each position within a hop.
+        self._norm = np.sum((self.window ** 2).reshape(overlap, self.hop), axis=0)
+
+    def reset(self):
+        self._stft = _framer(self.fs, self.nperseg, self.noverlap, self.batch_frames, self.workers)
+        # The input is preceded by nperseg - hop zeros so the first samples
+        # are covered by as many frames as the rest; they are dropped again
+        # from the output.
+        self._skip = self.nperseg - self._stft.hop
+        self._tail = np.zeros(self._skip)
+        self._stft.push(np.zeros(self._skip))
+        self._n_in = 0
+        self._n_out = 0
+
+    def _overlap_add(self, spectra):
+        power = spectra.real ** 2 + spectra.imag ** 2
+        spectra *= noise_gains(power, self.noise_power, self.method, self.strength, self.floor)
+        frames = irfft(spectra, self.nperseg, axis=-1, workers=self.workers)
+        frames *= self.window
+
+        n_frames, hop = len(frames), self.hop
+        overlap = self.nperseg // hop
+        out = np.zeros((n_frames + overlap - 1, hop))
+        for p in range(overlap):
+            out[p:p + n_frames] += frames[:, p * hop:(p + 1) * hop]
+        out = out.reshape(-1)
+        out[:len(self._tail)] += self._tail
+
+        done = n_frames * hop
+        self._tail = out[done:].copy()
+        out = out[:done].reshape(n_frames, hop) / self._norm
+        return out.reshape(-1)
+
+    def _emit(self, samples):
+        if self._skip:
+            dropped = min(self._skip, len(samples))
+            samples = samples[dropped:]
+            self._skip -= dropped
+        samples = samples[:self._n_in - self._n_out]
+        self._n_out += len(samples)
+        return samples
+
+    def _push(self, block):
+        out = [self._emit(self._overlap_add(spectra)) for _, spectra in self._stft.push(block)]
+        return np.concatenate(out) if out else np.zeros(0)
+
+    def process(self, block):
+        """
+        Denoises one block.
+
+        Returns:
+            np.array: Output samples completed by this block. The output
+                lags the input by up to one frame; flush() returns the rest.
+        """
+        self._n_in += len(block)
+        return self._push(block)
+
+    def flush(self):
+        """
+        Returns:
+            np.array: The remaining output once the input has ended.
+        """
+        # A frame of trailing zeros completes every frame that overlaps the input.
+        return self._push(np.zeros(self.nperseg))
+
+    def process_blocks(self, blocks):
+        """
+        Denoises an iterable of chunks lazily.
+
+        Yields:
+            np.array: Output chunks, in order.
+        """
+        for block in blocks:
+            out = self.process(block)
+            if len(out):
+                yield out
+        tail = self.flush()
+        if len(tail):
+            yield tail
+
+@timed
+def reduce_noise(signal, fs, noise_power=None, method='wiener', strength=1.0, floor=0.1, nperseg=2048,
+                 noverlap=None, segment=None, batch_frames=256, workers=-1):
+    """
+    Removes stationary (e.g. broadband) noise in the STFT domain.
+
+    A (samples, channels) input is processed channel by channel, with the
+    channels spread over `workers` threads; a missing noise profile is then
+    estimated per channel.
+
+    Args:
+        signal (np.array): Input signal, (samples,) or (samples, channels).
+        fs (int): Sampling rate.
+        noise_power (np.array): Noise power per bin. Estimated with
+            estimate_noise_profile (from segment, or by minimum statistics)
+            when not given.
+        method (str): 'wiener' or 'subtraction'.
+        strength (float): Over-subtraction factor.
+        floor (float): Minimum gain.
+        nperseg (int): Frame length in samples.
+        noverlap (int): Overlap between frames (default: nperseg // 2).
+        segment (tuple): Optional (start, end) in seconds of a noise-only stretch.
+        batch_frames (int): Number of frames transformed per rfft call.
+        workers (int): Worker threads for scipy.fft, or over the channels of
+            a multichannel input (-1 = all cores).
+
+    Returns:
+        np.array: Denoised signal, same shape as the input.
+    """
+    if np.ndim(signal) == 2:
+        def run(group):
+            return np.stack([reduce_noise(group[:, c], fs, noise_power, method, strength, floor, nperseg,
+                                          noverlap, segment, batch_frames, workers=1)
+                             for c in range(group.shape[1])], axis=1)
+        return map_channels(run, signal, axis=0, workers=workers)
+
+    if noise_power is None:
+        noise_power = estimate_noise_profile(signal, fs, nperseg, noverlap, segment, batch_frames, workers)
+    denoiser = SpectralDenoiser(fs, noise_power, nperseg, noverlap, method, strength, floor, batch_frames, workers)
+
+    out = np.empty(len(signal))
+    pos = 0
+    for block in denoiser.process_blocks(iter_blocks(signal, 65536)):
+        out[pos:pos + len(block)] = block
+        pos += len(block)
+    return out[:pos]
+
+cached_reduce_noise = cached(reduce_noise, persist=True)
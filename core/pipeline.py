@@ -0,0 +1,358 @@
+from abc import ABC, abstractmethod
+import numpy as np
+from core.signal_filters import StreamingFilter, StreamingFIR
+from core.signal_digitization import StreamingResampler, rational_ratio, _to_levels
+from core.frequency_analysis import STFTFramer
+from scipy.fft import rfftfreq
+from core.metrics import timed
+
+DEFAULT_BLOCK_SIZE = 65536
+
+# Elementwise stages are applied to sub-blocks of this many samples so the
+# data stays in cache while every fused operation runs over it.
+FUSE_CHUNK = 8192
+
+class Stage:
+    """
+    Base class for pipeline stages.
+
+    A stage is bound to the sampling rate of its input when the pipeline is
+    built, then receives consecutive blocks through process() and may emit
+    a tail from flush() once the input ends.
+    """
+
+    elementwise = False
+
+    def bind(self, fs):
+        """
+        Prepares the stage for input at rate fs.
+
+        Returns:
+            int: Sampling rate of the stage's output.
+        """
+        self.fs = fs
+        return fs
+
+    def reset(self):
+        pass
+
+    def output_length(self, n):
+        return n
+
+    def process(self, block):
+        return block
+
+    def flush(self):
+        return np.zeros(0)
+
+class ElementwiseStage(Stage, ABC):
+    """
+    Stage that maps each sample independently. Consecutive elementwise
+    stages are fused and run in place on a shared buffer. Subclasses
+    implement apply().
+    """
+
+    elementwise = True
+
+    @abstractmethod
+    def apply(self, buf):
+        """
+        Transforms buf in place.
+        """
+
+    def process(self, block):
+        buf = np.array(block, dtype=np.float64)
+        self.apply(buf)
+        return buf
+
+class Filter(Stage):
+    """
+    Butterworth or notch filter with state carried between blocks (see
+    apply_filter). Zero-phase filtering is not available in a stream.
+    """
+
+    def __init__(self, filter_type, cutoff, order=5, q=30.0):
+        self.filter_type = filter_type
+        self.cutoff = cutoff
+        self.order = order
+        self.q = q
+
+    def bind(self, fs):
+        self.fs = fs
+        self.filter = StreamingFilter.design(fs, self.filter_type, self.cutoff, self.order, self.q)
+        return fs
+
+    def reset(self):
+        self.filter.reset()
+
+    def process(self, block):
+        return self.filter.process(block)
+
+class Lowpass(Filter):
+    """
+    Butterworth low-pass with state carried between blocks (see apply_lowpass).
+    """
+
+    def __init__(self, cutoff, order=5):
+        super().__init__('lowpass', cutoff, order)
+
+class FIR(Stage):
+    """
+    Linear-phase FIR filter run by overlap-save (see apply_fir). The group
+    delay is removed: the first delay output samples are dropped and the
+    kernel's tail is flushed at the end, so the output is aligned with the
+    input and has the same length.
+    """
+
+    def __init__(self, filter_type, cutoff, numtaps=1025, method='auto'):
+        self.filter_type = filter_type
+        self.cutoff = cutoff
+        self.numtaps = numtaps
+        self.method = method
+
+    def bind(self, fs):
+        self.fs = fs
+        self.filter = StreamingFIR.design(fs, self.filter_type, self.cutoff, self.numtaps, self.method)
+        self.reset()
+        return fs
+
+    def reset(self):
+        self.filter.reset()
+        self._skip = self.filter.delay
+        self._seen = 0
+
+    def process(self, block):
+        self._seen += len(block)
+        out = self.filter.process(block)
+        if self._skip:
+            dropped = min(self._skip, len(out))
+            out = out[dropped:]
+            self._skip -= dropped
+        return out
+
+    def flush(self):
+        # Inputs shorter than the delay still yield one output per input sample.
+        tail = self.filter.process(np.zeros(self.filter.delay))[self._skip:]
+        n_tail = min(self._seen, self.filter.delay)
+        return tail[:n_tail]
+
+class Resample(Stage):
+    """
+    Polyphase resampler with state carried between blocks (see sample_signal).
+    """
+
+    def __init__(self, new_fs):
+        self.new_fs = new_fs
+
+    def bind(self, fs):
+        self.fs = fs
+        self.resampler = StreamingResampler(fs, self.new_fs) if fs != self.new_fs else None
+        return self.new_fs
+
+    def reset(self):
+        if self.resampler is not None:
+            self.resampler.reset()
+
+    def output_length(self, n):
+        if self.resampler is None:
+            return n
+        up, down = rational_ratio(self.fs, self.new_fs)
+        return n * up // down
+
+    def process(self, block):
+        return block if self.resampler is None else self.resampler.process(block)
+
+    def flush(self):
+        return np.zeros(0) if self.resampler is None else self.resampler.flush()
+
+class Gain(ElementwiseStage):
+    def __init__(self, gain):
+        self.gain = gain
+
+    def apply(self, buf):
+        buf *= self.gain
+
+class Clip(ElementwiseStage):
+    def __init__(self, limit=1.0):
+        self.limit = limit
+
+    def apply(self, buf):
+        np.clip(buf, -self.limit, self.limit, out=buf)
+
+class Quantize(ElementwiseStage):
+    """
+    Uniform quantizer (see quantize_signal). In a stream the full-scale
+    value has to be known up front; it defaults to 1.0.
+    """
+
+    def __init__(self, n_bits, max_val=1.0):
+        self.n_bits = n_bits
+        self.max_val = max_val
+
+    def apply(self, buf):
+        _to_levels(buf, self.n_bits, self.max_val, buf)
+        buf *= 2 * self.max_val / (2 ** self.n_bits - 1)
+        buf -= self.max_val
+
+class Spectrum(Stage):
+    """
+    Pass-through tap that accumulates a windowed, averaged (Welch)
+    magnitude spectrum of whatever flows through it (see compute_welch).
+    """
+
+    def __init__(self, nperseg=4096, noverlap=None, window_type='Hann'):
+        self.nperseg = nperseg
+        self.noverlap = noverlap
+        self.window_type = window_type
+
+    def bind(self, fs):
+        self.fs = fs
+        self.reset()
+        return fs
+
+    def reset(self):
+        self._framer = STFTFramer(self.fs, self.nperseg, self.noverlap, self.window_type)
+        self._power = np.zeros(self.nperseg // 2 + 1)
+        self._count = 0
+
+    def process(self, block):
+        for _, spectra in self._framer.push(block):
+            self._power += np.sum(spectra.real ** 2 + spectra.imag ** 2, axis=0)
+            self._count += len(spectra)
+        return block
+
+    def result(self, scale='Linear'):
+        """
+        Returns:
+            np.array: Frequency axis.
+            np.array: Averaged magnitude spectrum so far.
+        """
+        freqs = rfftfreq(self.nperseg, 1/self.fs)
+        magnitude = np.sqrt(self._power / max(self._count, 1)) / self.nperseg
+        if scale == 'Log':
+            magnitude = 20 * np.log10(magnitude + 1e-10)
+        return freqs, magnitude
+
+class _Fused(Stage):
+    """
+    Runs a group of elementwise stages in one pass over a reused buffer.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self._buf = np.zeros(0)
+
+    def process(self, block):
+        n = len(block)
+        if len(self._buf) < n:
+            self._buf = np.empty(n)
+        buf = self._buf[:n]
+        np.copyto(buf, block)
+        for start in range(0, n, FUSE_CHUNK):
+            chunk = buf[start:start + FUSE_CHUNK]
+            for stage in self.stages:
+                stage.apply(chunk)
+        return buf
+
+class Pipeline:
+    """
+    A chain of DSP stages executed block by block.
+
+    The same graph runs over an in-memory array (run) or a stream of
+    blocks (stream). Consecutive elementwise stages (gain, clip, quantize)
+    are fused into a single pass over a preallocated buffer, so no
+    full-size intermediates are created between stages.
+
+    Example:
+        pipe = Pipeline([Lowpass(3000), Resample(8000), Quantize(8), Spectrum(2048)], fs=44100)
+        out = pipe.run(signal)
+        freqs, magnitude = pipe.stages[-1].result()
+    """
+
+    def __init__(self, stages, fs, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Args:
+            stages (list): Stage instances, in processing order.
+            fs (int): Sampling rate of the input.
+            block_size (int): Samples per block when running over an array.
+        """
+        self.stages = list(stages)
+        self.fs = fs
+        self.block_size = block_size
+
+        rate = fs
+        for stage in self.stages:
+            rate = stage.bind(rate)
+        self.out_fs = rate
+
+        self._plan = []
+        group = []
+        for stage in self.stages:
+            if stage.elementwise:
+                group.append(stage)
+                continue
+            if group:
+                self._plan.append(_Fused(group))
+                group = []
+            self._plan.append(stage)
+        if group:
+            self._plan.append(_Fused(group))
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def output_length(self, n):
+        for stage in self.stages:
+            n = stage.output_length(n)
+        return n
+
+    def _push(self, block, start=0):
+        for stage in self._plan[start:]:
+            if len(block) == 0:
+                break
+            block = stage.process(block)
+        return block
+
+    def stream(self, blocks):
+        """
+        Processes an iterable of blocks lazily.
+
+        Yields:
+            np.array: Output blocks. A yielded block may be a reused buffer;
+                copy it if it must outlive the next iteration.
+        """
+        self.reset()
+        for block in blocks:
+            out = self._push(block)
+            if len(out):
+                yield out
+
+        # Flush stateful stages in order, pushing each tail through the rest.
+        for i, stage in enumerate(self._plan):
+            tail = stage.flush()
+            if len(tail):
+                out = self._push(tail, i + 1)
+                if len(out):
+                    yield out
+
+    @timed
+    def run(self, signal):
+        """
+        Processes a whole array into a preallocated output.
+
+        Args:
+            signal (np.array): Input signal.
+
+        Returns:
+            np.array: Output signal at self.out_fs.
+        """
+        n_out = self.output_length(len(signal))
+        out = np.empty(n_out)
+        pos = 0
+        blocks = (signal[i:i + self.block_size] for i in range(0, len(signal), self.block_size))
+        for block in self.stream(blocks):
+            take = min(len(block), n_out - pos)
+            out[pos:pos + take] = block[:take]
+            pos += take
+        return out[:pos]
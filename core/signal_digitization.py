@@ -1,62 +1,331 @@
+from fractions import Fraction
 import numpy as np
-from scipy.signal import resample
+from scipy.signal import resample, resample_poly, firwin, upfirdn
+from core.cache import cached
+from core.channels import map_channels
+from core.metrics import timed
 
-def sample_signal(signal, original_fs, new_fs):
+def rational_ratio(original_fs, new_fs, max_denominator=1000):
+    """
+    Approximates new_fs / original_fs by a fraction up / down.
+
+    Rates closer than the denominator limit can resolve (e.g. 44100 and
+    44099) give up == down == 1, which the resamplers treat as a
+    pass-through.
+
+    Args:
+        original_fs (int): Original sampling rate.
+        new_fs (int): Target sampling rate.
+        max_denominator (int): Largest allowed `down`; keeps the polyphase
+            filter short when the exact ratio has large terms.
+
+    Returns:
+        int: Upsampling factor.
+        int: Downsampling factor.
+    """
+    ratio = Fraction(new_fs) / Fraction(original_fs)
+    ratio = ratio.limit_denominator(max_denominator)
+    return ratio.numerator, ratio.denominator
+
+@timed
+def sample_signal(signal, original_fs, new_fs, method='polyphase', axis=0, workers=1):
     """
     Resamples the signal from original_fs to new_fs.
     
     Args:
-        signal (np.array): The input signal.
+        signal (np.array): The input signal, (samples,) or (samples, channels).
         original_fs (int): Original sampling rate.
         new_fs (int): Target sampling rate.
+        method (str): 'polyphase' (windowed FIR via resample_poly, fast for
+            any length) or 'fft' (scipy.signal.resample over the whole signal).
+        axis (int): Time axis; all channels are resampled in one call.
+        workers (int): Threads over groups of channels (see map_channels).
         
     Returns:
         np.array: Resampled signal.
         np.array: Time axis for the resampled signal.
     """
+    signal = np.asarray(signal)
+    n = signal.shape[axis]
     if new_fs == original_fs:
-        t = np.arange(len(signal)) / original_fs
+        t = np.arange(n) / original_fs
         return signal, t
     
-    num_samples = int(len(signal) * new_fs / original_fs)
+    num_samples = int(n * new_fs / original_fs)
     
-    resampled_signal = resample(signal, num_samples)
+    if method == 'fft':
+        resampled_signal = map_channels(lambda x: resample(x, num_samples, axis=axis), signal, axis, workers)
+    else:
+        up, down = rational_ratio(original_fs, new_fs)
+        resampled_signal = map_channels(lambda x: resample_poly(x, up, down, axis=axis), signal, axis, workers)
+        n_out = resampled_signal.shape[axis]
+        if n_out >= num_samples:
+            index = [slice(None)] * signal.ndim
+            index[axis] = slice(0, num_samples)
+            resampled_signal = resampled_signal[tuple(index)]
+        else:
+            padding = [(0, 0)] * signal.ndim
+            padding[axis] = (0, num_samples - n_out)
+            resampled_signal = np.pad(resampled_signal, padding)
     
     t = np.arange(num_samples) / new_fs
     
     return resampled_signal, t
 
-def quantize_signal(signal, n_bits):
+class StreamingResampler:
+    """
+    Block-by-block polyphase resampler.
+
+    Uses the same anti-aliasing filter as resample_poly and keeps only the
+    input history the filter still needs between blocks, so concatenated
+    output matches sample_signal(..., method='polyphase') on the whole
+    signal while memory stays proportional to the block size. A ratio
+    that rounds to 1 (see rational_ratio) passes blocks through unchanged.
+    """
+
+    def __init__(self, original_fs, new_fs, max_denominator=1000):
+        """
+        Args:
+            original_fs (int): Original sampling rate.
+            new_fs (int): Target sampling rate.
+            max_denominator (int): See rational_ratio.
+        """
+        self.up, self.down = rational_ratio(original_fs, new_fs, max_denominator)
+        self.passthrough = self.up == self.down
+        if self.passthrough:
+            self.reset()
+            return
+        max_rate = max(self.up, self.down)
+        half_len = 10 * max_rate
+        h = firwin(2 * half_len + 1, 1. / max_rate, window=('kaiser', 5.0)) * self.up
+
+        # Pad the front of the filter so its centre falls on a multiple of
+        # `down`; output m then lines up with upfirdn output index m.
+        pre_pad = (-half_len) % self.down
+        self.h = np.concatenate([np.zeros(pre_pad), h])
+        self.delay = half_len + pre_pad
+        self.reset()
+
+    def reset(self):
+        self._buf = np.zeros(0)
+        self._start = 0
+        self._n_in = 0
+        self._n_out = 0
+
+    def _emit(self, stop):
+        """
+        Computes outputs [self._n_out, stop) from the buffered input.
+        """
+        if stop <= self._n_out:
+            return np.zeros(0)
+        z = upfirdn(self.h, self._buf, self.up, self.down)
+        offset = (self.delay - self._start * self.up) // self.down
+        y = z[self._n_out + offset:stop + offset]
+        self._n_out = stop
+
+        # Drop input no later output can reach, keeping the buffer start a
+        # multiple of `down` so the offset above stays an integer.
+        earliest = (self._n_out * self.down + self.delay - len(self.h) + 1) // self.up
+        keep_from = max(earliest // self.down * self.down, self._start)
+        self._buf = self._buf[keep_from - self._start:]
+        self._start = keep_from
+        return y
+
+    def process(self, block):
+        """
+        Feeds one block and returns every output sample it completes.
+
+        Args:
+            block (np.array): Next chunk of the input signal.
+
+        Returns:
+            np.array: Resampled output (may be empty).
+        """
+        if self.passthrough:
+            self._n_in += len(block)
+            self._n_out += len(block)
+            return np.array(block, dtype=np.float64)
+        self._buf = np.concatenate([self._buf, block])
+        self._n_in += len(block)
+        n_end = self._start + len(self._buf)
+        ready = -(-(n_end * self.up - self.delay) // self.down)
+        total = self._n_in * self.up // self.down
+        return self._emit(max(min(ready, total), 0))
+
+    def flush(self):
+        """
+        Emits the remaining output, treating the signal as zero past its end.
+
+        Returns:
+            np.array: Final output samples.
+        """
+        if self.passthrough:
+            return np.zeros(0)
+        total = self._n_in * self.up // self.down
+        self._buf = np.concatenate([self._buf, np.zeros(len(self.h) // self.up + self.down + 1)])
+        return self._emit(total)
+
+    def resample_blocks(self, blocks):
+        """
+        Resamples an iterable of chunks lazily.
+
+        Yields:
+            np.array: Resampled chunks, in order.
+        """
+        for block in blocks:
+            y = self.process(block)
+            if len(y):
+                yield y
+        y = self.flush()
+        if len(y):
+            yield y
+
+def _float_dtype(signal):
+    return signal.dtype if signal.dtype in (np.float32, np.float64) else np.dtype(np.float64)
+
+def _peak(signal):
+    # max(|x|) without allocating a full-size np.abs temporary
+    if np.size(signal) == 0:
+        return 0.0
+    return max(float(np.max(signal)), -float(np.min(signal)))
+
+def _to_levels(signal, n_bits, max_val, out):
+    """
+    Writes the rounded, clipped level index (0 .. 2**n_bits - 1) into out.
+    """
+    L = 2 ** n_bits
+    np.multiply(signal, (L - 1) / (2 * max_val), out=out)
+    out += (L - 1) / 2
+    np.rint(out, out=out)
+    np.clip(out, 0, L - 1, out=out)
+    return out
+
+@timed
+def quantize_signal(signal, n_bits, max_val=None, out=None, error_out=None):
     """
     Quantizes the signal to n_bits.
     
+    Works in place on at most two full-size buffers (the quantized signal
+    and the error) and keeps float32 input in float32.
+    
     Args:
         signal (np.array): Input signal (assumed to be normalized between -1 and 1 or similar).
+            Any shape; all channels share one full-scale value, like an ADC.
         n_bits (int): Number of bits for quantization.
+        max_val (float): Full-scale value. Defaults to the peak of the signal;
+            pass the peak of the whole recording when quantizing an excerpt so
+            the levels match those of the full signal.
+        out (np.array): Optional preallocated buffer for the quantized signal.
+        error_out (np.array): Optional preallocated buffer for the error.
         
     Returns:
         np.array: Quantized signal.
         np.array: Quantization error.
     """
-    L = 2 ** n_bits
+    signal = np.asarray(signal)
+    dtype = _float_dtype(signal)
     
-    max_val = np.max(np.abs(signal))
+    if max_val is None:
+        max_val = _peak(signal)
+    if out is None:
+        out = np.empty(signal.shape, dtype=dtype)
     if max_val == 0:
-        return signal, np.zeros_like(signal)
+        # A zero full scale has a single level, at zero.
+        out[...] = 0
+        return out, np.subtract(signal, out, out=error_out, dtype=out.dtype)
+    
+    quantized_signal = _to_levels(signal, n_bits, max_val, out)
+    
+    # level * 2 / (L - 1) - 1, rescaled to the full-scale value
+    quantized_signal *= 2 * max_val / (2 ** n_bits - 1)
+    quantized_signal -= max_val
+    
+    error = np.subtract(signal, quantized_signal, out=error_out, dtype=quantized_signal.dtype)
+    
+    return quantized_signal, error
+
+@timed
+def quantize_codes(signal, n_bits, max_val=None, out=None):
+    """
+    Quantizes the signal and returns the integer level codes directly.
+    
+    Codes are centred on zero (-2**(n_bits-1) .. 2**(n_bits-1) - 1), like
+    signed PCM, and use the smallest of int8/int16/int32 that fits.
+    
+    Args:
+        signal (np.array): Input signal.
+        n_bits (int): Number of bits for quantization (1 to 32).
+        max_val (float): Full-scale value (default: peak of the signal).
+        out (np.array): Optional preallocated integer output buffer.
         
-    norm_signal = signal / max_val
+    Returns:
+        np.array: Integer codes.
+    """
+    signal = np.asarray(signal)
+    if n_bits <= 8:
+        code_dtype = np.int8
+    elif n_bits <= 16:
+        code_dtype = np.int16
+    else:
+        code_dtype = np.int32
     
+    if max_val is None:
+        max_val = _peak(signal)
+    if out is None:
+        out = np.empty(signal.shape, dtype=code_dtype)
+    if max_val == 0:
+        out[...] = 0
+        return out
     
+    levels = _to_levels(signal, n_bits, max_val, np.empty(signal.shape, dtype=_float_dtype(signal)))
+    levels -= 2 ** (n_bits - 1)
+    out[...] = levels
+    return out
+
+@timed
+def quantization_sweep(signal, bit_depths, max_val=None, block_size=65536):
+    """
+    Measures the SQNR of one signal at many bit depths in a single pass.
     
-    scaled = (norm_signal + 1) * (L - 1) / 2
-    quantized_levels = np.round(scaled)
+    The signal is read in blocks; each block is quantized at every depth
+    at once by broadcasting, so only (len(bit_depths), block_size) values
+    are held in memory. A depth with no quantization error (e.g. on a
+    silent signal) has an SQNR of +inf.
     
-    quantized_levels = np.clip(quantized_levels, 0, L - 1)
+    Args:
+        signal (np.array): Input signal. Any shape, blocks are taken along
+            the first axis; all channels share one full-scale value.
+        bit_depths (list): Bit depths to evaluate.
+        max_val (float): Full-scale value (default: peak of the signal).
+        block_size (int): Samples processed per step.
+        
+    Returns:
+        np.array: The bit depths.
+        np.array: Signal-to-quantization-noise ratio in dB per depth.
+    """
+    bits = np.asarray(bit_depths, dtype=np.int64)
+    if max_val is None:
+        max_val = _peak(signal)
     
-    quantized_norm = (quantized_levels * 2 / (L - 1)) - 1
+    L1 = (2.0 ** bits - 1)[:, None]
+    up = L1 / (2 * max_val) if max_val else np.zeros_like(L1)
+    down = 2 * max_val / L1
     
-    quantized_signal = quantized_norm * max_val
+    signal_power = 0.0
+    error_power = np.zeros(len(bits))
+    for start in range(0, len(signal), block_size):
+        block = np.asarray(signal[start:start + block_size], dtype=np.float64).reshape(-1)
+        levels = np.clip(np.rint(block * up + L1 / 2), 0, L1)
+        error = block - (levels * down - max_val)
+        error_power += np.einsum('ij,ij->i', error, error)
+        signal_power += np.dot(block, block)
     
-    error = signal - quantized_signal
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqnr = 10 * np.log10(signal_power / error_power)
+    sqnr[error_power == 0] = np.inf
     
-    return quantized_signal, error
+    return bits, sqnr
+
+cached_sample_signal = cached(sample_signal, persist=True)
+cached_quantize_signal = cached(quantize_signal, persist=True)
+cached_quantization_sweep = cached(quantization_sweep, persist=True)
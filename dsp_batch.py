@@ -0,0 +1,269 @@
+"""
+Headless batch runner for the DSP pipeline.
+
+Examples:
+    python dsp_batch.py recordings/ -o cleaned/ --lowpass 3000 --format flac
+    python dsp_batch.py "data/**/*.wav" -o out/ --resample 8000 --bits 8 --workers 8
+
+Each file is streamed block by block through a core.pipeline graph
+(low-pass -> resample -> quantize), so a worker's memory does not depend on file length. Finished files are
+appended to a JSONL manifest in the output directory together with a hash
+of the processing parameters; rerunning the same command skips them, while
+changed parameters reprocess every file.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import soundfile as sf
+
+from core.audio_source import AudioSource
+from core.pipeline import Pipeline, Lowpass, Resample, Quantize, Clip, Spectrum
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.mp3', '.aiff', '.aif')
+FORMATS = {'wav': ('WAV', 'PCM_16'), 'flac': ('FLAC', 'PCM_16'), 'wav32': ('WAV', 'FLOAT')}
+
+def _is_under(path, directory):
+    path, directory = os.path.abspath(path), os.path.abspath(directory)
+    return os.path.commonpath([path, directory]) == directory
+
+def find_inputs(pattern, exclude=None):
+    """
+    Expands a directory (searched recursively) or a glob into audio file paths.
+
+    Args:
+        pattern (str): Input directory or glob pattern.
+        exclude (str): Directory whose files are never inputs, e.g. the
+            output directory when it lies inside the input tree. In-progress
+            '.part' files are not audio files and are skipped as well.
+
+    Returns:
+        str: Root directory used to mirror the input layout in the output.
+        list: Sorted input paths.
+    """
+    if os.path.isdir(pattern):
+        root = pattern
+        paths = glob.glob(os.path.join(pattern, '**', '*'), recursive=True)
+    else:
+        paths = glob.glob(pattern, recursive=True)
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths]) if paths else '.'
+    paths = [p for p in paths if os.path.isfile(p) and p.lower().endswith(AUDIO_EXTENSIONS)]
+    if exclude is not None:
+        paths = [p for p in paths if not _is_under(p, exclude)]
+    return root, sorted(paths)
+
+def output_path(in_path, root, output_dir, fmt):
+    rel = os.path.relpath(os.path.abspath(in_path), os.path.abspath(root))
+    ext = '.flac' if fmt == 'flac' else '.wav'
+    return os.path.join(output_dir, os.path.splitext(rel)[0] + ext)
+
+def spec_hash(spec):
+    """
+    Hashes the parameters that affect a file's output (the block size does
+    not: streaming gives the same result for any block size).
+
+    Returns:
+        str: Hex digest.
+    """
+    relevant = {k: v for k, v in spec.items() if k != 'block_size'}
+    return hashlib.blake2b(json.dumps(relevant, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+def process_file(in_path, out_path, spec):
+    """
+    Runs the pipeline on one file, streaming it block by block.
+
+    Args:
+        in_path (str): Input audio file.
+        out_path (str): Output audio file.
+        spec (dict): Pipeline parameters: lowpass, order, resample, bits,
+            format, block_size, spectrum.
+
+    Returns:
+        dict: Manifest record for the file.
+    """
+    start = time.perf_counter()
+    source = AudioSource(in_path)
+    try:
+        return _process_source(source, in_path, out_path, spec, start)
+    finally:
+        source.close()
+
+def _process_source(source, in_path, out_path, spec, start):
+    fmt, subtype = FORMATS[spec.get('format', 'wav')]
+
+    stages = []
+    if spec.get('lowpass'):
+        stages.append(Lowpass(spec['lowpass'], spec.get('order', 5)))
+    if spec.get('resample'):
+        stages.append(Resample(spec['resample']))
+    if spec.get('bits'):
+        # Full-scale quantization: the ADC range is [-1, 1].
+        stages.append(Quantize(spec['bits'], max_val=1.0))
+    if subtype.startswith('PCM'):
+        stages.append(Clip(1.0))
+    spectrum = Spectrum(spec['spectrum']) if spec.get('spectrum') else None
+    if spectrum is not None:
+        stages.append(spectrum)
+
+    pipeline = Pipeline(stages, source.fs)
+    out_fs = pipeline.out_fs
+
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    tmp_path = out_path + '.part'
+    n_out = 0
+    try:
+        with sf.SoundFile(tmp_path, 'w', samplerate=out_fs, channels=1, format=fmt, subtype=subtype) as f:
+            for block in pipeline.stream(source.blocks(spec.get('block_size', 65536))):
+                f.write(block)
+                n_out += len(block)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    record = {
+        'input': in_path,
+        'output': out_path,
+        'status': 'ok',
+        'spec': spec_hash(spec),
+        'duration': source.duration,
+        'samples_out': n_out,
+        'fs_out': out_fs,
+        'seconds': time.perf_counter() - start,
+    }
+
+    if spectrum is not None:
+        freqs, magnitude = spectrum.result()
+        spectrum_path = os.path.splitext(out_path)[0] + '_spectrum.npz'
+        np.savez(spectrum_path, freqs=freqs, magnitude=magnitude)
+        record['spectrum'] = spectrum_path
+
+    return record
+
+def _safe_process(in_path, out_path, spec):
+    try:
+        return process_file(in_path, out_path, spec)
+    except Exception as e:
+        return {'input': in_path, 'output': out_path, 'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+
+def load_manifest(path, spec=None):
+    """
+    Args:
+        path (str): Manifest file.
+        spec (dict): Current parameters; when given, only records made with
+            the same parameters (see spec_hash) count.
+
+    Returns:
+        set: Inputs already processed successfully according to the manifest.
+    """
+    wanted = None if spec is None else spec_hash(spec)
+    done = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('status') == 'ok' and (wanted is None or record.get('spec') == wanted):
+                    done.add(record['input'])
+    return done
+
+def run_batch(inputs, root, output_dir, spec, workers=1, manifest_path=None, log=print):
+    """
+    Processes many files, in parallel when workers > 1.
+
+    Returns:
+        dict: Summary with counts and throughput.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(output_dir, 'manifest.jsonl')
+    done = load_manifest(manifest_path, spec)
+    todo = [p for p in inputs if p not in done]
+    if len(inputs) > len(todo):
+        log(f"Skipping {len(inputs) - len(todo)} file(s) already processed with these settings in {manifest_path}")
+
+    start = time.perf_counter()
+    ok = failed = 0
+    audio_seconds = 0.0
+
+    def record_result(record, manifest):
+        nonlocal ok, failed, audio_seconds
+        manifest.write(json.dumps(record) + '\n')
+        manifest.flush()
+        if record['status'] == 'ok':
+            ok += 1
+            audio_seconds += record['duration']
+        else:
+            failed += 1
+            log(f"FAILED {record['input']}: {record['error']}")
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        log(f"[{ok + failed}/{len(todo)}] {ok / elapsed:.2f} files/s, "
+            f"{audio_seconds / elapsed:.1f} audio-s/s")
+
+    jobs = [(p, output_path(p, root, output_dir, spec.get('format', 'wav'))) for p in todo]
+    with open(manifest_path, 'a') as manifest:
+        if workers <= 1:
+            for in_path, out_path in jobs:
+                record_result(_safe_process(in_path, out_path, spec), manifest)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_safe_process, i, o, spec) for i, o in jobs]
+                for future in as_completed(futures):
+                    record_result(future.result(), manifest)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'processed': ok,
+        'failed': failed,
+        'skipped': len(inputs) - len(todo),
+        'seconds': elapsed,
+        'files_per_second': ok / elapsed if elapsed else 0.0,
+        'audio_seconds_per_second': audio_seconds / elapsed if elapsed else 0.0,
+    }
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Batch-process audio files with the DSP Studio pipeline.")
+    parser.add_argument('inputs', help="Input directory (searched recursively) or glob pattern")
+    parser.add_argument('-o', '--output-dir', required=True, help="Directory for processed files and the manifest")
+    parser.add_argument('--lowpass', type=float, help="Low-pass cutoff frequency in Hz")
+    parser.add_argument('--order', type=int, default=5, help="Low-pass filter order (default: 5)")
+    parser.add_argument('--resample', type=int, help="Target sampling rate in Hz")
+    parser.add_argument('--bits', type=int, help="Quantization bit depth")
+    parser.add_argument('--format', choices=sorted(FORMATS), default='wav', help="Output format (default: wav, 16-bit)")
+    parser.add_argument('--spectrum', type=int, metavar='NPERSEG', help="Also save a Welch spectrum with this segment length")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument('--block-size', type=int, default=65536, help="Samples per processing block")
+    parser.add_argument('--manifest', help="Manifest path (default: OUTPUT_DIR/manifest.jsonl)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    root, inputs = find_inputs(args.inputs, exclude=args.output_dir)
+    if not inputs:
+        print(f"No audio files found for {args.inputs!r}", file=sys.stderr)
+        return 1
+
+    spec = {
+        'lowpass': args.lowpass,
+        'order': args.order,
+        'resample': args.resample,
+        'bits': args.bits,
+        'format': args.format,
+        'block_size': args.block_size,
+        'spectrum': args.spectrum,
+    }
+    summary = run_batch(inputs, root, args.output_dir, spec, workers=args.workers, manifest_path=args.manifest)
+    print(f"Done: {summary['processed']} processed, {summary['failed']} failed, {summary['skipped']} skipped "
+          f"in {summary['seconds']:.1f}s ({summary['files_per_second']:.2f} files/s, "
+          f"{summary['audio_seconds_per_second']:.1f} audio-s/s)")
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,12 @@
 import streamlit as st
 import os
 import sys
-from interface.common import load_css, render_header, convert_mp3_to_wav
-from interface.modules import sampling_tab, fft_tab, denoise_tab
-import soundfile as sf
-import numpy as np
+from interface.common import load_css, render_header
+from interface.pages import PAGES, load_page
+from interface.debug_panel import debug_panel_requested, render_debug_controls, render_debug_metrics
+from core.metrics import stage
+from core.audio_source import AudioSource
+from interface.downsampling import cached_pyramid
 
 st.set_page_config(
     page_title="Audio Signal Studio",
@@ -20,12 +22,14 @@ with st.sidebar:
     
     page = st.radio(
         "Navigate",
-        ["Studio Home", "Digital Conversion", "Fourier Analysis", "Noise Reduction"],
+        ["Studio Home"] + list(PAGES),
         index=0
     )
     
     st.markdown("---")
 
+debug_panel = render_debug_controls() if debug_panel_requested() else None
+
 
 if page == "Studio Home":
     render_header("Audio Signal Studio", "Advanced Signal Processing Suite")
@@ -34,37 +38,41 @@ if page == "Studio Home":
     with col2:
         st.markdown("### 📤 Upload Audio File")
         
-        uploaded_file = st.file_uploader("Upload Audio", type=['wav', 'mp3'], label_visibility="collapsed")
+        uploaded_file = st.file_uploader("Upload Audio", type=['wav', 'mp3', 'flac', 'ogg'], label_visibility="collapsed")
         
         if uploaded_file:
             st.session_state['uploaded_file'] = uploaded_file
+            file_key = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
             
-            if uploaded_file.name.lower().endswith('.mp3'):
-                with st.spinner("Converting MP3 to WAV..."):
-                    wav_io = convert_mp3_to_wav(uploaded_file)
-                    data, fs = sf.read(wav_io)
-                    st.success(f"Converted & Loaded: {uploaded_file.name}")
-            else:
-                data, fs = sf.read(uploaded_file)
-                st.success(f"Loaded: {uploaded_file.name}")
-            
-            if len(data.shape) > 1:
-                data = data.mean(axis=1)
+            if st.session_state.get('audio_key') != file_key:
+                # Compressed files are decoded once and cached on disk by
+                # content hash, so re-opening the same file is instant.
+                with st.spinner("Loading audio..."), stage("interface.home.load_audio"):
+                    source = AudioSource.from_upload(uploaded_file)
                 
-            st.session_state['audio_data'] = data
-            st.session_state['fs'] = fs
-            st.session_state['current_file'] = uploaded_file.name
+                previous = st.session_state.get('audio_source')
+                if previous is not None:
+                    previous.close()
+                    
+                st.session_state['audio_source'] = source
+                st.session_state['audio_data'] = source.samples
+                st.session_state['audio_pyramid'] = cached_pyramid(source.samples)
+                st.session_state['audio_bandwidth'] = None
+                st.session_state['fs'] = source.fs
+                st.session_state['current_file'] = uploaded_file.name
+                st.session_state['audio_key'] = file_key
             
+            st.success(f"Loaded: {uploaded_file.name}")
             st.audio(uploaded_file)
             
     if 'current_file' in st.session_state:
         st.info(f"Currently analyzing: **{st.session_state['current_file']}**")
 
-elif page == "Digital Conversion":
-    sampling_tab.render()
-
-elif page == "Fourier Analysis":
-    fft_tab.render()
+else:
+    # Pages (and their plotly/scipy imports) load on first visit only.
+    module = load_page(page)
+    with stage(f"{module.__name__}.render"):
+        module.render()
 
-elif page == "Noise Reduction":
-    denoise_tab.render()
+if debug_panel is not None:
+    render_debug_metrics(debug_panel)
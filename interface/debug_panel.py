@@ -0,0 +1,97 @@
+import os
+import streamlit as st
+from core.metrics import default_registry as metrics
+from core.cache import default_cache, default_disk_cache
+from interface.pages import import_times
+
+# tracemalloc slows every session on the server down, and ?debug=1 is open
+# to any visitor, so the panel may only switch allocation tracking on when
+# the operator started the app with it.
+ALLOCATION_TRACKING_ALLOWED = os.environ.get('DSP_METRICS_ALLOC') == '1'
+
+def debug_panel_requested():
+    """
+    Returns:
+        bool: Whether the sidebar debug panel should be shown (DSP_DEBUG=1
+            or ?debug=1 in the URL).
+    """
+    return os.environ.get('DSP_DEBUG') == '1' or st.query_params.get('debug') == '1'
+
+def render_debug_controls():
+    """
+    Draws the recording switches at the top of the debug panel.
+
+    Called before the page renders, so a change applies to this run.
+
+    Returns:
+        DeltaGenerator: The panel, for render_debug_metrics.
+    """
+    panel = st.sidebar.expander("🛠️ Performance Metrics")
+    with panel:
+        record = st.toggle("Record metrics", value=metrics.enabled)
+        allocations = st.toggle(
+            "Track allocations",
+            value=metrics.track_allocations,
+            disabled=not (record and ALLOCATION_TRACKING_ALLOWED),
+            help="Measures peak memory per call with tracemalloc; slows every call down while on."
+                 if ALLOCATION_TRACKING_ALLOWED else "Start the app with DSP_METRICS_ALLOC=1 to allow this."
+        )
+        allocations = allocations and ALLOCATION_TRACKING_ALLOWED
+
+    if record and (not metrics.enabled or allocations != metrics.track_allocations):
+        metrics.enable(track_allocations=allocations)
+    elif not record and metrics.enabled:
+        metrics.disable()
+    return panel
+
+def render_debug_metrics(panel):
+    """
+    Fills the debug panel with the metrics recorded so far, cache usage,
+    page import times and JSON / Prometheus exports.
+
+    Args:
+        panel (DeltaGenerator): Container from render_debug_controls.
+    """
+    with panel:
+        snapshot = metrics.snapshot()
+        if snapshot:
+            rows = []
+            for name, entry in sorted(snapshot.items(), key=lambda item: -item[1]['seconds_total']):
+                rows.append({
+                    'name': name,
+                    'calls': entry['calls'],
+                    'total ms': round(entry['seconds_total'] * 1000, 2),
+                    'max ms': round(entry['seconds_max'] * 1000, 2),
+                    'input MB': round(entry['input_bytes_total'] / 1e6, 2),
+                    'peak alloc MB': None if entry['alloc_peak_bytes'] is None else round(entry['alloc_peak_bytes'] / 1e6, 2),
+                    'cache hits': entry['cache_hits'],
+                    'cache misses': entry['cache_misses'],
+                })
+            st.dataframe(rows, hide_index=True)
+        else:
+            st.caption("No metrics recorded yet." if metrics.enabled else "Recording is off.")
+
+        memory, disk = default_cache.stats(), default_disk_cache.stats()
+        st.caption(
+            f"Memory cache: {memory['entries']} entries, {memory['bytes'] / 1e6:.1f} / {memory['max_bytes'] / 1e6:.0f} MB, "
+            f"{memory['hits']} hits / {memory['misses']} misses · "
+            f"Disk cache: {disk['entries']} entries, {disk['bytes'] / 1e6:.1f} / {disk['max_bytes'] / 1e6:.0f} MB"
+        )
+
+        imports = import_times()
+        if imports:
+            st.caption("Page imports: " + ", ".join(
+                f"{name.rsplit('.', 1)[-1]} {entry['seconds'] * 1000:.0f} ms" for name, entry in imports.items()
+            ))
+
+        col_json, col_prom, col_reset = st.columns(3)
+        with col_json:
+            st.download_button("JSON", data=metrics.to_json(), file_name="dsp_metrics.json",
+                               mime="application/json", on_click='ignore')
+        with col_prom:
+            st.download_button("Prometheus", data=metrics.to_prometheus(), file_name="dsp_metrics.prom",
+                               mime="text/plain", on_click='ignore')
+        with col_reset:
+            if st.button("Reset"):
+                metrics.reset()
+                st.rerun()
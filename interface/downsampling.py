@@ -0,0 +1,257 @@
+import numpy as np
+from core.cache import cached
+
+MAX_PLOT_POINTS = 4000
+
+def minmax_indices(y, n_out):
+    """
+    Picks the indices of the minimum and maximum of each bucket.
+
+    Every extreme value survives, so short transients and spectral peaks
+    stay visible however far the trace is reduced.
+
+    Args:
+        y (np.array): Trace values.
+        n_out (int): Target number of points (two per bucket).
+
+    Returns:
+        np.array: Sorted indices into y, at most about n_out of them.
+    """
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+
+    n_buckets = max(n_out // 2, 1)
+    bucket = int(np.ceil(n / n_buckets))
+    n_full = n // bucket
+
+    body = np.asarray(y[:n_full * bucket]).reshape(n_full, bucket)
+    base = np.arange(n_full) * bucket
+    lo = base + np.argmin(body, axis=1)
+    hi = base + np.argmax(body, axis=1)
+    idx = np.stack([np.minimum(lo, hi), np.maximum(lo, hi)], axis=1).ravel()
+
+    if n_full * bucket < n:
+        tail_start = n_full * bucket
+        tail = y[tail_start:]
+        tail_idx = tail_start + np.array(sorted((np.argmin(tail), np.argmax(tail))))
+        idx = np.concatenate([idx, tail_idx])
+
+    return np.unique(idx)
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets point selection.
+
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with the previously kept point and
+    the mean of the next bucket. Bucket means are computed in one
+    vectorized pass; only the chained selection loops over buckets.
+
+    Args:
+        x (np.array): Trace x values (None = sample index).
+        y (np.array): Trace values.
+        n_out (int): Number of points to keep.
+
+    Returns:
+        np.array: Sorted indices into y.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    if x is None:
+        x = np.arange(n, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts = edges[:-1]
+    counts = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(np.asarray(x[:n - 1], dtype=np.float64), starts) / counts, x[n - 1])
+    mean_y = np.append(np.add.reduceat(np.asarray(y[:n - 1], dtype=np.float64), starts) / counts, y[n - 1])
+
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = starts[i], edges[i + 1]
+        xs = x[lo:hi]
+        ys = y[lo:hi]
+        area = np.abs((x[a] - mean_x[i + 1]) * (ys - y[a]) - (x[a] - xs) * (mean_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+
+    return idx
+
+def decimate_trace(x, y, max_points=MAX_PLOT_POINTS, method='minmax'):
+    """
+    Reduces a trace to at most max_points for plotting.
+
+    Args:
+        x (np.array): Trace x values.
+        y (np.array): Trace values.
+        max_points (int): Point budget.
+        method (str): 'minmax' (envelope, keeps every extreme) or 'lttb'
+            (visually faithful line shape).
+
+    Returns:
+        np.array: Reduced x values.
+        np.array: Reduced y values.
+    """
+    if len(y) <= max_points:
+        return x, y
+    if method == 'lttb':
+        idx = lttb_indices(x, y, max_points)
+    else:
+        idx = minmax_indices(y, max_points)
+    return x[idx], y[idx]
+
+def _bucket_stats(samples, bucket):
+    """
+    Min, max and mean power of consecutive buckets of a float32 block; a
+    trailing partial bucket is summarized on its own.
+    """
+    full = len(samples) // bucket * bucket
+    buckets = samples[:full].reshape(-1, bucket)
+    mins, maxs = buckets.min(axis=1), buckets.max(axis=1)
+    power = np.square(buckets).mean(axis=1, dtype=np.float32)
+    if full < len(samples):
+        tail = samples[full:]
+        mins = np.append(mins, tail.min())
+        maxs = np.append(maxs, tail.max())
+        power = np.append(power, np.square(tail).mean(dtype=np.float32))
+    return mins, maxs, power
+
+def _halve(values, reduce):
+    """
+    Merges pairs of buckets; an odd trailing bucket is carried over alone.
+    """
+    m = len(values) // 2 * 2
+    merged = reduce(values[:m].reshape(-1, 2), axis=1)
+    return np.append(merged, values[m:]) if m < len(values) else merged
+
+class WaveformPyramid:
+    """
+    Min/max/RMS overview of a signal at power-of-two bucket sizes.
+
+    Level k summarizes each base_bucket * 2 ** k samples. With the default
+    256-sample base all levels together take about 2.3% of the signal's
+    float32 size. They are built once per loaded file in a single chunked
+    pass and let any zoom window wide enough for the base level be drawn in
+    O(max_points); narrower windows are reduced from the samples themselves
+    (see envelope()).
+    """
+
+    def __init__(self, signal, chunk_size=1 << 20, base_bucket=256):
+        """
+        Args:
+            signal (np.array): Input signal (may be a memory map).
+            chunk_size (int): Samples read per step while building level 0.
+            base_bucket (int): Samples per bucket of level 0 (a power of two).
+        """
+        self.length = len(signal)
+        self.base_bucket = base_bucket
+        self.peak = 0.0
+        self.levels = []
+        if not self.length:
+            return
+
+        chunk_size = max(chunk_size // base_bucket, 1) * base_bucket
+        parts = [_bucket_stats(np.asarray(signal[start:start + chunk_size], dtype=np.float32), base_bucket)
+                 for start in range(0, self.length, chunk_size)]
+        mins, maxs, power = (np.concatenate(arrays) for arrays in zip(*parts))
+        self.peak = float(max(-mins.min(), maxs.max()))
+
+        while True:
+            self.levels.append((mins, maxs, np.sqrt(power)))
+            if len(mins) < 4:
+                break
+            mins = _halve(mins, np.min)
+            maxs = _halve(maxs, np.max)
+            power = _halve(power, np.mean)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for level in self.levels for a in level)
+
+    def bucket_size(self, start, stop, max_points=MAX_PLOT_POINTS):
+        """
+        Samples per bucket of the coarsest level that still gives at least
+        max_points / 2 buckets over signal[start:stop].
+        """
+        level = 0
+        while level < len(self.levels) - 1 and 2 * (stop - start) / (self.base_bucket << level) > max_points:
+            level += 1
+        return self.base_bucket << level
+
+    def window(self, start, stop, max_points=MAX_PLOT_POINTS):
+        """
+        Per-bucket statistics of signal[start:stop].
+
+        Args:
+            start (int): First sample of the window.
+            stop (int): One past the last sample of the window.
+            max_points (int): Point budget (two points per bucket).
+
+        Returns:
+            np.array: Start sample of each bucket.
+            np.array: Bucket minima.
+            np.array: Bucket maxima.
+            np.array: Bucket RMS values.
+        """
+        bucket = self.bucket_size(start, stop, max_points)
+        mins, maxs, rms = self.levels[(bucket // self.base_bucket).bit_length() - 1]
+
+        first = start // bucket
+        last = min(-(-stop // bucket), len(mins))
+        starts = np.arange(first, last) * bucket
+        return starts, mins[first:last], maxs[first:last], rms[first:last]
+
+    def envelope(self, start, stop, max_points=MAX_PLOT_POINTS):
+        """
+        Interleaved min/max envelope of signal[start:stop].
+
+        Returns:
+            np.array: Sample positions (float) of the returned points.
+            np.array: Envelope values.
+        """
+        bucket = self.bucket_size(start, stop, max_points)
+        starts, mins, maxs, _ = self.window(start, stop, max_points)
+        values = np.stack([mins, maxs], axis=1).ravel()
+        positions = (starts[:, None] + np.array([0, bucket / 2])).ravel()
+        return positions, values
+
+cached_pyramid = cached(WaveformPyramid, persist=True)
+
+def envelope(signal, start, stop, max_points=MAX_PLOT_POINTS, pyramid=None):
+    """
+    Min/max envelope of signal[start:stop] in O(max_points).
+
+    Args:
+        signal (np.array): Full signal.
+        start (int): First sample of the window.
+        stop (int): One past the last sample of the window.
+        max_points (int): Point budget.
+        pyramid (WaveformPyramid): Pyramid of the signal (built and cached on
+            demand when omitted).
+
+    Returns:
+        np.array: Sample positions (float) of the returned points.
+        np.array: Envelope values.
+    """
+    start = max(int(start), 0)
+    stop = min(int(stop), len(signal))
+    if stop - start <= max_points:
+        return np.arange(start, stop, dtype=np.float64), signal[start:stop]
+
+    if pyramid is None:
+        pyramid = cached_pyramid(signal)
+
+    if 2 * (stop - start) / pyramid.base_bucket >= max_points:
+        return pyramid.envelope(start, stop, max_points)
+
+    # Too narrow for the pyramid's base level: reduce the window itself.
+    bucket = -(-2 * (stop - start) // max_points)
+    mins, maxs, _ = _bucket_stats(np.asarray(signal[start:stop], dtype=np.float32), bucket)
+    values = np.stack([mins, maxs], axis=1).ravel()
+    positions = (start + np.arange(len(mins))[:, None] * bucket + np.array([0, bucket / 2])).ravel()
+    return positions, values
@@ -1,10 +1,159 @@
 import streamlit as st
 import numpy as np
+import time
+import uuid
 import plotly.graph_objects as go
-from scipy.signal import spectrogram
-from core.signal_filters import apply_lowpass
-from core.frequency_analysis import compute_fft
-from interface.common import render_header, get_audio_download_link
+from core.signal_filters import cached_apply_filter, cached_apply_fir
+from core.noise_reduction import cached_estimate_noise_profile, cached_reduce_noise, fit_noise_segment
+from core.frequency_analysis import cached_compute_welch
+from core.cache import signal_hash
+from core.jobs import default_runner, JobCancelled
+from core.audio_source import export_audio
+from core.metrics import stage
+from interface.common import render_header, render_audio_download
+from interface.downsampling import decimate_trace
+
+def _filter_controls(data, fs):
+    """
+    Returns:
+        str: Name of the chosen method.
+        tuple: Key identifying the settings.
+        callable: Runs the filter over the whole signal.
+
+        None if the settings are invalid (an error has been shown).
+    """
+    method = st.radio(
+        "Filter Type",
+        ["Low-pass Filter", "High-pass Filter", "Band-pass Filter", "Notch Filter"],
+        horizontal=True
+    )
+    
+    max_freq = int(fs/2)-100
+    if method == "Band-pass Filter":
+        filter_type = 'bandpass'
+        cutoff = st.slider(
+            "Pass Band (Hz)",
+            min_value=100,
+            max_value=max_freq,
+            value=(300, min(3400, max_freq)),
+            step=100
+        )
+        if cutoff[0] >= cutoff[1]:
+            st.error("The pass band needs a lower edge below its upper edge.")
+            return None
+    elif method == "Notch Filter":
+        filter_type = 'notch'
+        cutoff = st.slider(
+            "Notch Frequency (Hz)",
+            min_value=20,
+            max_value=max_freq,
+            value=50,
+            step=10,
+            help="Removes a narrow band around this frequency, e.g. 50/60 Hz mains hum."
+        )
+    else:
+        filter_type = 'lowpass' if method == "Low-pass Filter" else 'highpass'
+        cutoff = st.slider(
+            "Cutoff Frequency (Hz)",
+            min_value=100,
+            max_value=max_freq,
+            value=3000 if filter_type == 'lowpass' else 300,
+            step=100
+        )
+    
+    design = "IIR (Butterworth)"
+    if filter_type != 'notch':
+        design = st.radio(
+            "Filter Design",
+            ["IIR (Butterworth)", "FIR (Linear Phase)"],
+            horizontal=True,
+            help="FIR filters have exactly linear phase and are applied by FFT convolution; longer kernels give sharper transitions."
+        )
+    
+    if design == "FIR (Linear Phase)":
+        numtaps = st.select_slider(
+            "FIR Length (Taps)",
+            options=[65, 257, 1025, 4097],
+            value=1025
+        )
+        filter_key = ('fir', filter_type, cutoff, numtaps)
+        run_filter = lambda: cached_apply_fir(data, fs, filter_type, cutoff, numtaps=numtaps, workers=-1)
+    else:
+        zero_phase = st.checkbox(
+            "Zero-phase filtering",
+            help="Runs the filter forward and backward so transients are not shifted in time (doubles the effective order)."
+        )
+        filter_key = ('iir', filter_type, cutoff, zero_phase)
+        run_filter = lambda: cached_apply_filter(data, fs, filter_type, cutoff, zero_phase=zero_phase, workers=-1)
+    
+    return method, filter_key, run_filter
+
+def _spectral_controls(data, fs):
+    """
+    Returns:
+        str: Name of the chosen method.
+        tuple: Key identifying the settings.
+        callable: Runs the noise reduction over the whole signal.
+
+        None if the settings are invalid (an error has been shown).
+    """
+    method = st.radio(
+        "Gain Rule",
+        ["Wiener", "Spectral Subtraction"],
+        horizontal=True,
+        help="Wiener gains are smoother; spectral subtraction removes more noise but can leave 'musical' artifacts."
+    )
+    
+    strength = st.slider(
+        "Reduction Strength",
+        min_value=0.5,
+        max_value=4.0,
+        value=1.5,
+        step=0.1,
+        help="Multiplies the noise estimate before it is removed."
+    )
+    
+    profile_source = st.radio(
+        "Noise Profile",
+        ["Automatic (minimum statistics)", "Quiet segment"],
+        horizontal=True,
+        help="Automatic tracking works under continuous sound; a segment that holds only noise gives the most accurate profile."
+    )
+    
+    segment = None
+    if profile_source == "Quiet segment":
+        duration = len(data) / fs
+        segment = st.slider(
+            "Noise-only Segment (s)",
+            min_value=0.0,
+            max_value=float(round(duration, 1)),
+            value=(0.0, float(round(min(0.5, duration), 1))),
+            step=0.1
+        )
+        try:
+            fitted = fit_noise_segment(segment, fs, len(data))
+        except ValueError as e:
+            st.error(f"A noise profile cannot be taken from this file: {e}")
+            return None
+        if fitted != tuple(segment):
+            st.caption(f"Segment widened to {fitted[0]:.3f}–{fitted[1]:.3f} s, one analysis frame.")
+        segment = fitted
+    
+    rule = 'wiener' if method == "Wiener" else 'subtraction'
+    
+    def run_filter():
+        if data.ndim == 2:
+            # Each channel gets its own noise profile.
+            return cached_reduce_noise(data, fs, method=rule, strength=strength, segment=segment)
+        # The profile only depends on the file and segment, so changing the
+        # strength or gain rule reuses it and runs just the gain pass.
+        noise_power = cached_estimate_noise_profile(data, fs, segment=segment)
+        return cached_reduce_noise(data, fs, noise_power=noise_power, method=rule, strength=strength)
+    
+    return f"{method} Noise Reduction", ('spectral', rule, strength, segment), run_filter
+
+def _mono(signal):
+    return signal.mean(axis=1) if signal.ndim == 2 else signal
 
 def render():
     render_header("Noise Reduction", "Advanced Filtering Engine")
@@ -15,10 +164,13 @@ def render():
 
     data = st.session_state['audio_data']
     fs = st.session_state['fs']
+    source = st.session_state.get('audio_source')
     
     st.markdown("### 📘 Filter Characteristics")
     st.markdown("""
     **Low-Pass Filtering** allows low-frequency components to pass through while attenuating frequencies above a specified cutoff point. This is essential for removing high-frequency noise.
+    High-pass, band-pass and notch filters remove rumble, out-of-band noise and narrow interference such as mains hum in the same way.
+    **Spectral Noise Reduction** instead estimates the noise spectrum and attenuates every time-frequency bin according to its signal-to-noise ratio, so broadband hiss is removed without cutting off the signal's own high frequencies.
     """)
     
     st.latex(r"|H(j\omega)| = \frac{1}{\sqrt{1 + (\frac{\omega}{\omega_c})^{2n}}}")
@@ -31,49 +183,89 @@ def render():
     
     st.markdown("### 🎛️ Parameter Adjustment")
     
-    method = "Low-pass Filter"
+    # Multichannel files are processed with every channel kept; the mono
+    # mix is still used for the spectra below.
+    signal = data
+    if source is not None and source.channels > 1:
+        if st.checkbox(f"Process all {source.channels} channels", value=True,
+                       help="Filters every channel in one vectorized pass (channels run in parallel) instead of the mono mix."):
+            signal = source.channel_samples
+    
+    engine = st.radio(
+        "Engine",
+        ["Filter", "Spectral Noise Reduction"],
+        horizontal=True,
+        help="Filters remove whole frequency bands; spectral noise reduction removes broadband noise across the spectrum while keeping the signal."
+    )
+    
+    if engine == "Filter":
+        controls = _filter_controls(signal, fs)
+    else:
+        controls = _spectral_controls(signal, fs)
+    if controls is None:
+        return
+    method, filter_key, run_filter = controls
     
-    cutoff = st.slider(
-        "Cutoff Frequency (Hz)",
-        min_value=100,
-        max_value=int(fs/2)-100,
-        value=3000,
-        step=100
+    # Heavy work runs on the shared job pool. A newer cutoff replaces the
+    # job in this session's slot, and moving the slider interrupts the
+    # wait below, so only the latest setting runs to completion.
+    slot = ('denoise', st.session_state.setdefault('job_slot', uuid.uuid4().hex))
+    job = default_runner.submit(
+        ('denoise', signal_hash(signal), fs) + filter_key,
+        [
+            ('Filtering', lambda r: run_filter()),
+            ('Original spectrum', lambda r: cached_compute_welch(data, fs, nperseg=8192, window_type='Hann', scale='Log')),
+            ('Processed spectrum', lambda r: cached_compute_welch(_mono(r['Filtering']), fs, nperseg=8192, window_type='Hann', scale='Log')),
+            ('Encoding', lambda r: export_audio(r['Filtering'], fs)),
+        ],
+        slot=slot
     )
-    processed_data = apply_lowpass(data, fs, cutoff)
+    
+    if not job.done():
+        progress = st.progress(job.progress, text="Queued...")
+        while not job.done():
+            time.sleep(0.1)
+            progress.progress(job.progress, text=f"{job.stage or 'Finishing'}...")
+        progress.empty()
+    
+    try:
+        results = job.result()
+    except JobCancelled:
+        return
+    except Exception as e:
+        st.error(f"Processing failed: {e}")
+        return
+    
+    processed_data = results['Filtering']
             
     st.markdown("### 🎧 A/B Monitoring")
     
     st.markdown("**Original Signal**")
-    st.audio(data, sample_rate=fs)
+    with stage("interface.denoise_tab.original_audio"):
+        st.audio(export_audio(signal, fs), format='audio/wav')
     
     st.markdown("**Processed Signal**")
     
     col_audio, col_dl = st.columns([6, 1])
     
     with col_audio:
-        st.audio(processed_data, sample_rate=fs)
+        with stage("interface.denoise_tab.processed_audio"):
+            st.audio(results['Encoding'], format='audio/wav')
         
     with col_dl:
-        # download icon
-        import io
-        import base64
-        buffer = io.BytesIO()
-        import soundfile as sf
-        sf.write(buffer, processed_data, fs, format='WAV')
-        buffer.seek(0)
-        b64 = base64.b64encode(buffer.read()).decode()
-        filename = f"cleaned_{method.lower().replace(' ', '_')}.wav"
-        
-        href = f'<a href="data:audio/wav;base64,{b64}" download="{filename}" style="text-decoration: none; display: inline-flex; align-items: center; justify-content: center; width: 40px; height: 40px; border-radius: 50%; background: #00FF9D; color: #0d1117; font-size: 24px; font-weight: bold;">↓</a>'
-        st.markdown(href, unsafe_allow_html=True)
+        # download icon (FLAC is encoded only when clicked)
+        filename = f"cleaned_{method.lower().replace(' ', '_')}"
+        render_audio_download(processed_data, fs, filename=filename, label="↓", help="Download processed audio (FLAC)")
     
 
         
     st.markdown("### 📉 Magnitude Response Comparison")
     
-    freqs_orig, mag_orig, _ = compute_fft(data, fs, window_type='Hann', scale='Log')
-    freqs_proc, mag_proc, _ = compute_fft(processed_data, fs, window_type='Hann', scale='Log')
+    freqs_orig, mag_orig = results['Original spectrum']
+    freqs_proc, mag_proc = results['Processed spectrum']
+    
+    freqs_orig, mag_orig = decimate_trace(freqs_orig, mag_orig, method='lttb')
+    freqs_proc, mag_proc = decimate_trace(freqs_proc, mag_proc, method='lttb')
     
     fig_spec = go.Figure()
     
@@ -110,4 +302,5 @@ def render():
         )
     )
     
-    st.plotly_chart(fig_spec, use_container_width=True)
+    with stage("interface.denoise_tab.spectrum_chart"):
+        st.plotly_chart(fig_spec, use_container_width=True)
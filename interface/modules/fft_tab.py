@@ -1,8 +1,10 @@
 import streamlit as st
 import numpy as np
 import plotly.graph_objects as go
-from core.frequency_analysis import compute_fft
+from core.frequency_analysis import cached_compute_fft, cached_compute_stft, cached_compute_welch, cached_track_peaks, spectral_peaks
+from core.metrics import stage
 from interface.common import render_header
+from interface.downsampling import decimate_trace
 
 def render():
     render_header("Fourier Analysis", "Frequency Domain Analysis")
@@ -42,8 +44,24 @@ def render():
         horizontal=True,
         label_visibility="collapsed"
     )
-        
-    freqs, magnitude_linear, phase = compute_fft(data, fs, window_type='Hann', scale='Linear')
+    
+    mode = st.radio(
+        "Spectrum Mode",
+        ["Averaged (Welch)", "Full Resolution"],
+        horizontal=True,
+        help="Welch averaging splits the signal into overlapping segments and averages their spectra, giving a smoother, fixed-size spectrum."
+    )
+    
+    if mode == "Averaged (Welch)":
+        nperseg = st.select_slider(
+            "Segment Length (Samples)",
+            options=[1024, 2048, 4096, 8192, 16384],
+            value=8192
+        )
+        freqs, magnitude_linear = cached_compute_welch(data, fs, nperseg=nperseg, window_type='Hann', scale='Linear')
+    else:
+        freqs, magnitude_linear, phase, plan = cached_compute_fft(data, fs, window_type='Hann', scale='Linear', nfft='fast', return_plan=True)
+        st.caption(f"FFT plan: {plan.describe()}")
 
     if scale == "Log":
         magnitude = 20 * np.log10(magnitude_linear + 1e-10)
@@ -52,11 +70,13 @@ def render():
     
     st.markdown("### 📊 Spectrum")
     
+    freqs_plot, magnitude_plot = decimate_trace(freqs, magnitude)
+    
     fig_mag = go.Figure()
     
     fig_mag.add_trace(go.Scatter(
-        x=freqs,
-        y=magnitude,
+        x=freqs_plot,
+        y=magnitude_plot,
         mode='lines',
         name='Magnitude',
         line=dict(color='#8B5CF6', width=1.5),
@@ -72,17 +92,13 @@ def render():
         height=500
     )
     
-    st.plotly_chart(fig_mag, use_container_width=True)
+    with stage("interface.fft_tab.magnitude_chart"):
+        st.plotly_chart(fig_mag, use_container_width=True)
     
     st.markdown("### 🏔️ Peak Frequencies")
     
     if len(magnitude) > 1:
-        mag_no_dc = magnitude[1:]
-        freqs_no_dc = freqs[1:]
-        
-        top_indices = np.argsort(mag_no_dc)[-5:][::-1]
-        top_freqs = freqs_no_dc[top_indices]
-        top_mags = mag_no_dc[top_indices]
+        top_freqs, top_mags, _ = spectral_peaks(magnitude, freqs, k=5, scale=scale)
         
         cols = st.columns(5)
         for i, (f, m) in enumerate(zip(top_freqs, top_mags)):
@@ -100,3 +116,48 @@ def render():
                 </div>
                 """, unsafe_allow_html=True)
 
+    st.markdown("### 🌈 Spectrogram")
+    
+    st.markdown("""
+    The **Short-Time Fourier Transform (STFT)** slides a window along the signal and computes an FFT for each frame, showing how the spectrum evolves over time.
+    """)
+    
+    nperseg = st.select_slider(
+        "Frame Length (Samples)",
+        options=[256, 512, 1024, 2048],
+        value=1024
+    )
+    
+    spec_freqs, spec_times, spec_mag = cached_compute_stft(
+        data, fs, nperseg=nperseg, window_type='Hann', scale='Log', max_frames=400
+    )
+    
+    fig_spec = go.Figure(go.Heatmap(
+        x=spec_times,
+        y=spec_freqs,
+        z=spec_mag.T,
+        colorscale='Viridis',
+        colorbar=dict(title="dB")
+    ))
+    
+    track_times, track_freqs, _ = cached_track_peaks(
+        data, fs, nperseg=nperseg, window_type='Hann', k=1, max_frames=400
+    )
+    fig_spec.add_trace(go.Scatter(
+        x=track_times,
+        y=track_freqs[:, 0],
+        mode='lines',
+        name='Dominant Frequency',
+        line=dict(color='#EF4444', width=1.5)
+    ))
+    
+    fig_spec.update_layout(
+        title="Spectrogram",
+        xaxis_title="Time (s)",
+        yaxis_title="Frequency (Hz)",
+        template="plotly_dark",
+        height=500
+    )
+    
+    with stage("interface.fft_tab.spectrogram_chart"):
+        st.plotly_chart(fig_spec, use_container_width=True)
@@ -1,9 +1,16 @@
 import streamlit as st
 import numpy as np
 import plotly.graph_objects as go
-from core.signal_digitization import sample_signal, quantize_signal
-from core.frequency_analysis import compute_fft
-from interface.common import render_header, get_audio_download_link
+from core.signal_digitization import sample_signal, quantize_signal, cached_quantization_sweep
+from core.frequency_analysis import cached_estimate_bandwidth
+from core.pipeline import Pipeline, Resample, Quantize
+from core.metrics import stage
+from interface.common import render_header
+from interface.downsampling import decimate_trace, cached_pyramid, envelope
+
+# Extra samples resampled on each side of the zoom window so the
+# FFT resampler's edge effects stay outside the visible span.
+RESAMPLE_MARGIN = 1024
 
 def render():
     render_header("Digital Conversion", "ADC Simulation")
@@ -14,12 +21,16 @@ def render():
 
     data = st.session_state['audio_data']
     fs = st.session_state['fs']
-    
-    # Calculate Nyquist Rate
-    f_orig, mag_orig, _ = compute_fft(data, fs, window_type='Hann', scale='Linear')
-    threshold = 0.01 * np.max(mag_orig)
-    significant_freqs = f_orig[mag_orig > threshold]
-    f_max = np.max(significant_freqs) if len(significant_freqs) > 0 else 0
+    pyramid = st.session_state.get('audio_pyramid')
+    if pyramid is None:
+        pyramid = cached_pyramid(data)
+    
+    # Calculate Nyquist Rate (once per file; reset when a new file is loaded)
+    bandwidth = st.session_state.get('audio_bandwidth')
+    if bandwidth is None:
+        bandwidth = cached_estimate_bandwidth(data, fs)
+        st.session_state['audio_bandwidth'] = bandwidth
+    f_max, occupied_bw = bandwidth
     nyquist_rate = 2 * f_max
     
     st.markdown("### 📊 Signal Processing & Visualization")
@@ -39,6 +50,13 @@ def render():
         value=8
     )
     
+    method = st.radio(
+        "Resampling Method",
+        ["Polyphase", "FFT"],
+        horizontal=True,
+        help="Polyphase filtering is fast for any signal length; the FFT method resamples the whole span in the frequency domain."
+    )
+    
     zoom_range = st.slider("Zoom (Samples)", 0, len(data), (0, 1000))
     start_idx, end_idx = zoom_range
     
@@ -52,31 +70,38 @@ def render():
             <div style="font-size: 0.9rem; color: #9CA3AF;">Nyquist Rate</div>
             <div style="font-size: 1.5rem; font-weight: bold; color: #00FF9D;">{nyquist_rate:.0f} Hz</div>
         </div>
+        <div>
+            <div style="font-size: 0.9rem; color: #9CA3AF;">Occupied Bandwidth (99%)</div>
+            <div style="font-size: 1.5rem; font-weight: bold; color: #00FF9D;">{occupied_bw:.0f} Hz</div>
+        </div>
     </div>
     """, unsafe_allow_html=True)
     
-    resampled_signal, t_resampled = sample_signal(data, fs, new_fs)
-    
-    quantized_signal, error = quantize_signal(resampled_signal, n_bits)
+    # Only the visible span is resampled and quantized; the full-scale value
+    # comes from the pyramid so the levels match the whole recording.
+    seg_start = max(start_idx - RESAMPLE_MARGIN, 0)
+    seg_end = min(end_idx + RESAMPLE_MARGIN, len(data))
+    segment = data[seg_start:seg_end]
+    full_scale = pyramid.peak or 1.0
     
-    ratio = new_fs / fs
-    start_res = int(start_idx * ratio)
-    end_res = int(end_idx * ratio)
+    if method == "Polyphase":
+        adc = Pipeline([Resample(new_fs), Quantize(n_bits, max_val=full_scale)], fs)
+        quantized_signal = adc.run(segment)
+    else:
+        resampled_signal, _ = sample_signal(segment, fs, new_fs, method='fft')
+        quantized_signal, error = quantize_signal(resampled_signal, n_bits, max_val=full_scale)
+    t_resampled = np.arange(len(quantized_signal)) / new_fs + seg_start / fs
     
     fig = go.Figure()
     
-    t_orig = np.arange(start_idx, end_idx) / fs
-    y_orig = data[start_idx:end_idx]
-    
     max_plot_points = 5000
-    if len(t_orig) > max_plot_points:
-        step = int(np.ceil(len(t_orig) / max_plot_points))
-        t_plot = t_orig[::step]
-        y_plot = y_orig[::step]
-        st.caption(f"⚠️ Visualizing 1 out of every {step} samples for performance.")
+    if end_idx - start_idx > max_plot_points:
+        pos_orig, y_plot = envelope(data, start_idx, end_idx, max_plot_points, pyramid=pyramid)
+        st.caption("⚠️ Showing the min/max envelope of the zoomed range for performance.")
     else:
-        t_plot = t_orig
-        y_plot = y_orig
+        pos_orig = np.arange(start_idx, end_idx)
+        y_plot = data[start_idx:end_idx]
+    t_plot = pos_orig / fs
 
     fig.add_trace(go.Scatter(
         x=t_plot, 
@@ -87,16 +112,21 @@ def render():
         opacity=0.7
     ))
     
-    t_new = t_resampled[start_res:end_res]
-    y_new = quantized_signal[start_res:end_res]
+    if end_idx - start_idx > max_plot_points:
+        rms_starts, _, _, rms = pyramid.window(start_idx, end_idx, max_plot_points)
+        fig.add_trace(go.Scatter(
+            x=rms_starts / fs,
+            y=rms,
+            mode='lines',
+            name='RMS Level',
+            line=dict(color='#F59E0B', width=1, dash='dot')
+        ))
     
-    if len(t_new) > max_plot_points:
-        step_new = int(np.ceil(len(t_new) / max_plot_points))
-        t_new_plot = t_new[::step_new]
-        y_new_plot = y_new[::step_new]
-    else:
-        t_new_plot = t_new
-        y_new_plot = y_new
+    visible = (t_resampled >= start_idx / fs) & (t_resampled < end_idx / fs)
+    t_new = t_resampled[visible]
+    y_new = quantized_signal[visible]
+    
+    t_new_plot, y_new_plot = decimate_trace(t_new, y_new, max_plot_points)
     
     fig.add_trace(go.Scatter(
         x=t_new_plot, 
@@ -122,4 +152,52 @@ def render():
         )
     )
     
-    st.plotly_chart(fig, use_container_width=True)
+    with stage("interface.sampling_tab.signal_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+    
+    st.markdown("### 📏 Bit-Depth Comparison")
+    
+    st.markdown("""
+    Each extra bit doubles the number of quantization levels and improves the **Signal-to-Quantization-Noise Ratio (SQNR)** by about 6 dB.
+    """)
+    
+    st.latex(r"\text{SQNR} \approx 6.02\,N + 1.76 \text{ dB}")
+    
+    bit_depths, sqnr = cached_quantization_sweep(data, tuple(range(2, 17)), max_val=pyramid.peak)
+    
+    fig_sqnr = go.Figure()
+    
+    fig_sqnr.add_trace(go.Scatter(
+        x=bit_depths,
+        y=sqnr,
+        mode='lines+markers',
+        name='Measured SQNR',
+        line=dict(color='#00FF9D', width=2)
+    ))
+    
+    fig_sqnr.add_trace(go.Scatter(
+        x=bit_depths,
+        y=6.02 * bit_depths + 1.76,
+        mode='lines',
+        name='Theoretical (full-scale sine)',
+        line=dict(color='#9CA3AF', width=1, dash='dash')
+    ))
+    
+    fig_sqnr.add_trace(go.Scatter(
+        x=[n_bits],
+        y=[sqnr[n_bits - 2]],
+        mode='markers',
+        name=f'Selected ({n_bits}-bit)',
+        marker=dict(color='#EF4444', size=12)
+    ))
+    
+    fig_sqnr.update_layout(
+        title="SQNR vs Bit Depth",
+        xaxis_title="Bits",
+        yaxis_title="SQNR (dB)",
+        template="plotly_dark",
+        height=400
+    )
+    
+    with stage("interface.sampling_tab.sqnr_chart"):
+        st.plotly_chart(fig_sqnr, use_container_width=True)
@@ -0,0 +1,129 @@
+import importlib
+import re
+import subprocess
+import sys
+import threading
+import time
+
+# Page name -> module with a render() function. Each module (and with it
+# plotly, scipy.signal, scipy.fft, ...) is imported the first time its page
+# is shown; Studio Home is rendered by the app script itself.
+PAGES = {
+    "Digital Conversion": 'interface.modules.sampling_tab',
+    "Fourier Analysis": 'interface.modules.fft_tab',
+    "Noise Reduction": 'interface.modules.denoise_tab',
+}
+
+# Modules Studio Home must be able to paint without. (plotly.graph_objects
+# is not listed: streamlit's own chart element imports it, and it loads
+# its submodules lazily.)
+HEAVY_MODULES = ('scipy.signal', 'scipy.fft') + tuple(PAGES.values())
+
+_import_times = {}
+_lock = threading.Lock()
+
+def load_page(name):
+    """
+    Imports the module behind a page, once per process.
+
+    Always goes through importlib, whose per-module lock makes a thread
+    wait for an import in progress elsewhere instead of getting a
+    half-initialised module; once imported this is a dictionary lookup.
+    The first import is timed and recorded together with the number of
+    modules it pulled in (see import_times).
+
+    Args:
+        name (str): Page name, a key of PAGES.
+
+    Returns:
+        module: The page module.
+    """
+    module_name = PAGES[name]
+    with _lock:
+        fresh = module_name not in sys.modules
+        before = len(sys.modules)
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        elapsed = time.perf_counter() - start
+        if fresh:
+            _import_times.setdefault(module_name, {
+                'seconds': elapsed,
+                'modules': len(sys.modules) - before,
+            })
+    return module
+
+def import_times():
+    """
+    Returns:
+        dict: Module name -> {'seconds', 'modules'} for each page imported
+            by load_page in this process.
+    """
+    with _lock:
+        return {name: dict(entry) for name, entry in _import_times.items()}
+
+_IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+def measure_imports(module_name, python=None, cwd=None):
+    """
+    Measures the cold import cost of a module in a fresh interpreter.
+
+    Runs `python -X importtime -c "import <module>"`, so nothing is shared
+    with the calling process.
+
+    Args:
+        module_name (str): Module to import, e.g. 'dsp_studio_app'.
+        python (str): Interpreter to use (default: sys.executable).
+        cwd (str): Working directory for the child process.
+
+    Returns:
+        float: Cumulative import time of module_name in seconds.
+        list: (module, self seconds, cumulative seconds) for every module
+            imported, in import order.
+    """
+    result = subprocess.run(
+        [python or sys.executable, '-X', 'importtime', '-c', f"import {module_name}"],
+        capture_output=True, text=True, cwd=cwd
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module_name} failed:\n{result.stderr[-2000:]}")
+
+    modules = []
+    total = 0.0
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, _, name = match.groups()
+        modules.append((name, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+        if name == module_name:
+            total = int(cumulative_us) / 1e6
+    return total, modules
+
+def _package(name):
+    return name.split('.')[0]
+
+def main(argv=None):
+    """
+    Prints the cold import cost of the app script (what Studio Home needs
+    before its first paint) and of each page, grouped by top-level package.
+    """
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Report per-module import cost of the app and its pages.")
+    parser.add_argument('--top', type=int, default=8, help="Packages listed per entry point.")
+    args = parser.parse_args(argv)
+
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    targets = [("Studio Home", 'dsp_studio_app')] + list(PAGES.items())
+    for label, module_name in targets:
+        total, modules = measure_imports(module_name, cwd=root)
+        by_package = {}
+        for name, self_time, _ in modules:
+            by_package[_package(name)] = by_package.get(_package(name), 0.0) + self_time
+        print(f"{label} ({module_name}): {total * 1000:.0f} ms, {len(modules)} modules")
+        for package, seconds in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {package:<24} {seconds * 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Performance benchmarks for the core DSP functions and the tab pipelines.
+
+Requires pytest-benchmark. Not collected by the default test run; invoke
+it explicitly:
+
+    python -m pytest tests/benchmark_dsp.py
+
+Environment variables:
+    DSP_BENCH_DURATIONS   Comma-separated signal lengths in seconds
+                          (default "1,10"; the full sweep is "1,60,600,3600").
+    DSP_BENCH_RATES       Comma-separated sampling rates
+                          (default "8000,44100,48000,96000").
+    DSP_BENCH_BASELINES   Baseline JSON file (default tests/bench_baselines.json).
+    DSP_BENCH_UPDATE      Set to 1 to (re)write the baselines from this run.
+    DSP_BENCH_THRESHOLD   Allowed slowdown / memory growth (default 0.25 = 25%).
+    DSP_BENCH_STARTUP_BUDGET
+                          Seconds the app script may add to streamlit's own
+                          import time before Studio Home is painted (default 0.4).
+
+Each case records the median wall time (pytest-benchmark), the peak
+traced allocation size during one call, that peak expressed as a number
+of input-sized copies, and the growth of the process RSS high-water mark.
+"""
+import json
+import os
+import resource
+import sys
+import tracemalloc
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip('pytest_benchmark')
+
+from core.frequency_analysis import compute_fft, compute_welch, compute_stft
+from core.signal_filters import apply_lowpass
+from core.signal_digitization import sample_signal, quantize_signal, quantization_sweep
+from core.pipeline import Pipeline, Resample, Quantize
+from interface.downsampling import WaveformPyramid, decimate_trace
+from interface.pages import measure_imports, HEAVY_MODULES
+
+DURATIONS = [float(d) for d in os.environ.get('DSP_BENCH_DURATIONS', '1,10').split(',')]
+RATES = [int(r) for r in os.environ.get('DSP_BENCH_RATES', '8000,44100,48000,96000').split(',')]
+BASELINES = os.environ.get('DSP_BENCH_BASELINES', os.path.join(os.path.dirname(__file__), 'bench_baselines.json'))
+UPDATE = os.environ.get('DSP_BENCH_UPDATE') == '1'
+THRESHOLD = float(os.environ.get('DSP_BENCH_THRESHOLD', '0.25'))
+STARTUP_BUDGET = float(os.environ.get('DSP_BENCH_STARTUP_BUDGET', '0.4'))
+
+def _is_prime(n):
+    if n < 2:
+        return False
+    if n % 2 == 0:
+        return n == 2
+    f = 3
+    while f * f <= n:
+        if n % f == 0:
+            return False
+        f += 2
+    return True
+
+def _prime_below(n):
+    n -= 1
+    while not _is_prime(n):
+        n -= 1
+    return n
+
+_signals = {}
+
+def synthetic_signal(fs, duration, variant):
+    """
+    Vibrato 'singing' with harmonics plus white noise, like
+    tests/generate_test_audio.py. The 'prime' variant trims the length to
+    the largest prime below it, the worst case for FFT sizes.
+    """
+    key = (fs, duration, variant)
+    if key not in _signals:
+        n = int(fs * duration)
+        if variant == 'prime':
+            n = _prime_below(n)
+        t = np.arange(n) / fs
+        f0 = 440 + 5 * np.sin(2 * np.pi * 5 * t)
+        phase = 2 * np.pi * np.cumsum(f0) / fs
+        signal = 0.5 * np.sin(phase) + 0.3 * np.sin(2 * phase) + 0.2 * np.sin(3 * phase)
+        signal += np.random.default_rng(0).normal(0, 0.05, n)
+        signal /= np.max(np.abs(signal))
+        _signals.clear()
+        _signals[key] = signal
+    return _signals[key]
+
+def sampling_tab_pipeline(signal, fs):
+    freqs, mag = compute_welch(signal, fs, nperseg=8192)
+    pyramid = WaveformPyramid(signal)
+    window = signal[:min(len(signal), fs)]
+    Pipeline([Resample(8000), Quantize(8, max_val=pyramid.peak)], fs).run(window)
+    quantization_sweep(signal, range(2, 17), max_val=pyramid.peak)
+    pyramid.envelope(0, len(signal), 5000)
+
+def fourier_tab_pipeline(signal, fs):
+    freqs, mag = compute_welch(signal, fs, nperseg=8192)
+    decimate_trace(freqs, mag)
+    compute_stft(signal, fs, nperseg=1024, scale='Log', max_frames=400)
+
+def denoise_tab_pipeline(signal, fs):
+    processed = apply_lowpass(signal, fs, min(3000, fs / 2 - 100))
+    compute_welch(signal, fs, nperseg=8192, scale='Log')
+    compute_welch(processed, fs, nperseg=8192, scale='Log')
+
+CASES = {
+    'compute_fft': lambda x, fs: compute_fft(x, fs, window_type='Hann', nfft='fast'),
+    'compute_welch': lambda x, fs: compute_welch(x, fs, nperseg=8192),
+    'compute_stft': lambda x, fs: compute_stft(x, fs, nperseg=1024, max_frames=400),
+    'apply_lowpass': lambda x, fs: apply_lowpass(x, fs, min(3000, fs / 2 - 100)),
+    'sample_signal_polyphase': lambda x, fs: sample_signal(x, fs, 8000 if fs != 8000 else 4000),
+    'sample_signal_fft': lambda x, fs: sample_signal(x, fs, 8000 if fs != 8000 else 4000, method='fft'),
+    'quantize_signal': lambda x, fs: quantize_signal(x, 8),
+    'tab_sampling': sampling_tab_pipeline,
+    'tab_fourier': fourier_tab_pipeline,
+    'tab_denoise': denoise_tab_pipeline,
+}
+
+_results = {}
+
+def _memory_profile(fn, x, fs):
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    fn(x, fs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'peak_alloc_bytes': peak,
+        'peak_copies': peak / x.nbytes,
+        'rss_growth_kb': rss_after - rss_before,
+    }
+
+def _load_baselines():
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as f:
+            return json.load(f)
+    return {}
+
+@pytest.fixture(scope='session', autouse=True)
+def _write_baselines():
+    yield
+    if UPDATE and _results:
+        baselines = _load_baselines()
+        baselines.update(_results)
+        with open(BASELINES, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+
+@pytest.mark.parametrize('variant', ['exact', 'prime'])
+@pytest.mark.parametrize('duration', DURATIONS)
+@pytest.mark.parametrize('fs', RATES)
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_benchmark(benchmark, name, fs, duration, variant):
+    fn = CASES[name]
+    x = synthetic_signal(fs, duration, variant)
+
+    memory = _memory_profile(fn, x, fs)
+    rounds = 3 if len(x) < 10_000_000 else 1
+    benchmark.pedantic(fn, args=(x, fs), rounds=rounds, iterations=1, warmup_rounds=0)
+    if benchmark.stats is None:
+        # --benchmark-disable: the function ran once, nothing to compare.
+        return
+
+    key = f"{name}|{fs}|{duration:g}s|{variant}"
+    result = dict(memory, median_seconds=benchmark.stats.stats.median, samples=len(x))
+    benchmark.extra_info.update(result)
+    _results[key] = result
+
+    baseline = _load_baselines().get(key)
+    if baseline is None or UPDATE:
+        return
+
+    limit = 1 + THRESHOLD
+    assert result['median_seconds'] <= baseline['median_seconds'] * limit, (
+        f"{key}: {result['median_seconds']:.4f}s vs baseline {baseline['median_seconds']:.4f}s"
+    )
+    assert result['peak_alloc_bytes'] <= baseline['peak_alloc_bytes'] * limit, (
+        f"{key}: peak {result['peak_alloc_bytes']} B vs baseline {baseline['peak_alloc_bytes']} B"
+    )
+
+def test_startup_time_to_first_paint():
+    """
+    Cold-imports the app script in a fresh interpreter (which paints Studio
+    Home in bare mode) and compares it with importing streamlit alone.
+    """
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    total, modules = measure_imports('dsp_studio_app', cwd=root)
+    names = {name for name, _, _ in modules}
+    streamlit_time = next(cumulative for name, _, cumulative in modules if name == 'streamlit')
+
+    assert not names.intersection(HEAVY_MODULES), f"Studio Home imported {sorted(names.intersection(HEAVY_MODULES))}"
+    assert total - streamlit_time <= STARTUP_BUDGET, (
+        f"app adds {total - streamlit_time:.3f}s to streamlit's {streamlit_time:.3f}s import "
+        f"(budget {STARTUP_BUDGET}s)"
+    )
@@ -1,13 +1,28 @@
 import unittest
+import gc
+import io
+import json
 import numpy as np
 import sys
 import os
+import subprocess
+import tempfile
+import soundfile as sf
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from core.signal_digitization import sample_signal, quantize_signal
-from core.frequency_analysis import compute_fft
-from core.signal_filters import apply_lowpass
+from core.signal_digitization import sample_signal, quantize_signal, quantize_codes, quantization_sweep, StreamingResampler, rational_ratio
+from core.frequency_analysis import get_window_array, compute_fft, compute_stft, iter_stft, STFTFramer, compute_welch, plan_fft, spectral_peaks, track_peaks, estimate_bandwidth
+from core.signal_filters import apply_lowpass, apply_filter, design_filter, StreamingFilter, iter_blocks, design_fir, fir_filter, apply_fir, StreamingFIR
+from core.audio_source import AudioSource, export_audio, decode_audio, read_wav_header
+from core.cache import ResultCache, DiskCache, cached, call_key, signal_hash
+from core.jobs import JobRunner, JobCancelled
+from core.pipeline import Pipeline, ElementwiseStage, Lowpass, Resample, Gain, Quantize, Spectrum, FIR
+from core.noise_reduction import estimate_noise_profile, fit_noise_segment, reduce_noise, SpectralDenoiser
+from core.channels import map_channels
+from core.metrics import MetricsRegistry, timed, stage, default_registry
+from dsp_batch import find_inputs, run_batch
+from interface.downsampling import minmax_indices, lttb_indices, envelope, WaveformPyramid
 
 class TestDSP(unittest.TestCase):
     
@@ -58,5 +73,746 @@ class TestDSP(unittest.TestCase):
         
         self.assertGreater(mag_10, mag_400 * 10) # At least 10x attenuation
 
+    def test_streaming_lowpass_matches_whole_array(self):
+        mixed_sig = self.signal + np.sin(2 * np.pi * 400 * self.t)
+        
+        expected = apply_lowpass(mixed_sig, self.fs, cutoff=100)
+        
+        stream = StreamingFilter.lowpass(self.fs, cutoff=100)
+        blocks = list(stream.filter_blocks(iter_blocks(mixed_sig, 128)))
+        
+        np.testing.assert_array_equal(np.concatenate(blocks), expected)
+        
+        stream.reset()
+        self.assertEqual(len(stream.process(mixed_sig[:10])), 10)
+
+    def test_audio_source_downmix_and_windows(self):
+        stereo = np.stack([self.signal, 0.5 * self.signal], axis=1)
+        fd, path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        sf.write(path, stereo, self.fs, subtype='FLOAT')
+        
+        source = AudioSource(path, owns_file=True)
+        try:
+            expected = stereo.mean(axis=1).astype(np.float32)
+            
+            self.assertEqual(len(source), len(self.signal))
+            self.assertEqual(source.fs, self.fs)
+            
+            blocks = list(source.blocks(block_size=300))
+            self.assertEqual(blocks[0].dtype, np.float32)
+            np.testing.assert_allclose(np.concatenate(blocks), expected, atol=1e-6)
+            np.testing.assert_allclose(source[100:200], expected[100:200], atol=1e-6)
+            
+            samples = source.samples
+            self.assertIsInstance(samples, np.memmap)
+            np.testing.assert_allclose(samples, expected, atol=1e-6)
+        finally:
+            source.close()
+        
+        self.assertFalse(os.path.exists(path))
+        
+        # A source dropped without close() still removes its files.
+        fd, path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        sf.write(path, stereo, self.fs, subtype='FLOAT')
+        source = AudioSource(path, owns_file=True)
+        source.samples, source.channel_samples
+        paths = [path, source._samples_path, source._channel_samples_path]
+        del source
+        gc.collect()
+        self.assertFalse(any(os.path.exists(p) for p in paths))
+
+    def test_result_cache_hits_and_eviction(self):
+        cache = ResultCache(max_bytes=3 * self.signal.nbytes)
+        calls = []
+        
+        def double(signal, gain=2):
+            calls.append(gain)
+            return signal * gain
+        
+        cached_double = cached(double, cache=cache)
+        
+        first = cached_double(self.signal)
+        second = cached_double(self.signal.copy())
+        self.assertIs(first, second)
+        self.assertFalse(first.flags.writeable)
+        self.assertEqual(calls, [2])
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+        
+        for gain in (3, 4, 5):
+            cached_double(self.signal, gain=gain)
+        
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertLessEqual(cache.current_bytes, cache.max_bytes)
+        
+        # Positional, keyword and default spellings of a call share a key.
+        self.assertEqual(call_key(double, (self.signal, 2)), call_key(double, (self.signal,), {'gain': 2}))
+        self.assertEqual(call_key(double, (self.signal,)), call_key(double, (), {'signal': self.signal, 'gain': 2}))
+        cached_double(self.signal, 5)
+        self.assertEqual(calls, [2, 3, 4, 5])
+        
+        self.assertNotEqual(signal_hash(self.signal), signal_hash(self.signal[::-1]))
+
+    def test_stft_matches_framewise_fft_and_streams(self):
+        nperseg = 128
+        freqs, times, mag = compute_stft(self.signal, self.fs, nperseg=nperseg)
+        
+        hop = nperseg // 2
+        n_frames = (len(self.signal) - nperseg) // hop + 1
+        self.assertEqual(mag.shape, (n_frames, nperseg // 2 + 1))
+        
+        window = np.hanning(nperseg + 1)[:-1]
+        frame = self.signal[3 * hop:3 * hop + nperseg]
+        expected = np.abs(np.fft.rfft(frame * window)) / nperseg
+        np.testing.assert_allclose(mag[3], expected, rtol=1e-5, atol=1e-7)
+        
+        peak_freq = freqs[np.argmax(mag.mean(axis=0))]
+        self.assertAlmostEqual(peak_freq, self.f_sig, delta=self.fs / nperseg)
+        
+        streamed = [s for _, s in iter_stft(iter_blocks(self.signal, 100), self.fs, nperseg=nperseg)]
+        np.testing.assert_allclose(np.abs(np.concatenate(streamed)) / nperseg, mag, rtol=1e-5, atol=1e-7)
+        
+        _, bounded_times, bounded = compute_stft(self.signal, self.fs, nperseg=nperseg, max_frames=5)
+        self.assertLessEqual(len(bounded), 5)
+        self.assertEqual(len(bounded_times), len(bounded))
+
+    def test_welch_fixed_size_and_streaming(self):
+        t = np.arange(0, 10, 1/self.fs)
+        tone = np.sin(2 * np.pi * 125 * t)
+        
+        freqs, mag = compute_welch(tone, self.fs, nperseg=256)
+        self.assertEqual(len(freqs), 129)
+        self.assertEqual(len(mag), 129)
+        self.assertAlmostEqual(freqs[np.argmax(mag)], 125, delta=self.fs / 256)
+        
+        _, full_mag, _ = compute_fft(tone, self.fs, window_type='Hann')
+        self.assertAlmostEqual(np.max(mag), np.max(full_mag), delta=0.02)
+        
+        _, streamed = compute_welch(iter_blocks(tone, 700), self.fs, nperseg=256)
+        np.testing.assert_allclose(streamed, mag)
+        
+        short_freqs, _ = compute_welch(self.signal[:100], self.fs, nperseg=256)
+        self.assertEqual(len(short_freqs), 51)
+
+    def test_visual_downsampling_preserves_peaks(self):
+        y = np.zeros(100000)
+        y[12345] = 5.0
+        y[67890] = -3.0
+        
+        idx = minmax_indices(y, 1000)
+        self.assertLessEqual(len(idx), 1002)
+        self.assertIn(12345, idx)
+        self.assertIn(67890, idx)
+        
+        idx = lttb_indices(None, y, 500)
+        self.assertEqual(len(idx), 500)
+        self.assertIn(12345, idx)
+        self.assertTrue(np.all(np.diff(idx) > 0))
+        
+        positions, values = envelope(y, 10000, 90000, max_points=1000)
+        self.assertLessEqual(len(values), 1000)
+        self.assertEqual(values.max(), 5.0)
+        self.assertEqual(values.min(), -3.0)
+        self.assertTrue(np.all((positions >= 8000) & (positions < 92000)))
+
+    def test_waveform_pyramid_levels(self):
+        signal = np.tile([1.0, -1.0, 0.5, -0.5], 2500)
+        pyramid = WaveformPyramid(signal, chunk_size=1000)
+        
+        self.assertEqual(pyramid.peak, 1.0)
+        self.assertEqual(pyramid.levels[0][0].dtype, np.float32)
+        self.assertLess(pyramid.nbytes, 2 * signal.nbytes)
+        
+        # Levels start at 256-sample buckets: a few percent of the float32
+        # signal, and a peak in the trailing partial bucket is kept.
+        long_signal = np.zeros(1_000_003, dtype=np.float32)
+        long_signal[-1] = 2.0
+        long_pyramid = WaveformPyramid(long_signal)
+        self.assertLess(long_pyramid.nbytes, 0.03 * long_signal.nbytes)
+        self.assertEqual(long_pyramid.peak, 2.0)
+        self.assertEqual(long_pyramid.envelope(0, len(long_signal), 100)[1].max(), 2.0)
+        
+        starts, mins, maxs, rms = pyramid.window(0, len(signal), max_points=100)
+        self.assertLessEqual(2 * len(starts), 100)
+        np.testing.assert_allclose(mins, -1.0)
+        np.testing.assert_allclose(maxs, 1.0)
+        np.testing.assert_allclose(rms, np.sqrt(0.625), rtol=1e-6)
+        
+        excerpt, _ = quantize_signal(0.5 * self.signal, 4, max_val=1.0)
+        full, _ = quantize_signal(np.concatenate([self.signal, 0.5 * self.signal]), 4)
+        np.testing.assert_allclose(excerpt, full[len(self.signal):])
+
+    def test_polyphase_and_streaming_resampling(self):
+        t = np.arange(0, 2, 1/44100)
+        tone = np.sin(2 * np.pi * 440 * t)
+        
+        poly, t_poly = sample_signal(tone, 44100, 8000)
+        fft, _ = sample_signal(tone, 44100, 8000, method='fft')
+        self.assertEqual(len(poly), int(len(tone) * 8000 / 44100))
+        self.assertEqual(len(poly), len(fft))
+        np.testing.assert_allclose(poly[1000:-1000], fft[1000:-1000], atol=5e-3)
+        
+        resampler = StreamingResampler(44100, 8000)
+        streamed = np.concatenate(list(resampler.resample_blocks(iter_blocks(tone, 4096))))
+        np.testing.assert_allclose(streamed, poly, atol=1e-12)
+        
+        # Rates too close for the ratio's denominator limit pass through.
+        self.assertEqual(rational_ratio(44100, 44099), (1, 1))
+        near, _ = sample_signal(tone, 44100, 44099)
+        np.testing.assert_array_equal(near, tone[:len(near)])
+        streamed = np.concatenate(list(StreamingResampler(44100, 44099).resample_blocks(iter_blocks(tone, 4096))))
+        np.testing.assert_array_equal(streamed, tone)
+        pipe = Pipeline([Resample(44099)], 44100, block_size=4096)
+        np.testing.assert_array_equal(pipe.run(tone), tone)
+        self.assertEqual(pipe.out_fs, 44099)
+
+    def test_quantization_buffers_codes_and_sweep(self):
+        signal32 = self.signal.astype(np.float32)
+        out = np.empty_like(signal32)
+        error_out = np.empty_like(signal32)
+        
+        quantized, error = quantize_signal(signal32, 8, out=out, error_out=error_out)
+        self.assertIs(quantized, out)
+        self.assertIs(error, error_out)
+        self.assertEqual(quantized.dtype, np.float32)
+        np.testing.assert_allclose(quantized + error, signal32, atol=1e-6)
+        
+        codes = quantize_codes(self.signal, 8)
+        self.assertEqual(codes.dtype, np.int8)
+        self.assertEqual(quantize_codes(self.signal, 12).dtype, np.int16)
+        reference, _ = quantize_signal(self.signal, 8)
+        np.testing.assert_allclose((codes.astype(float) + 128) * 2 / 255 - 1, reference, atol=1e-12)
+        
+        bits, sqnr = quantization_sweep(self.signal, [4, 8, 12], block_size=300)
+        _, error_8 = quantize_signal(self.signal, 8)
+        expected_8 = 10 * np.log10(np.sum(self.signal ** 2) / np.sum(error_8 ** 2))
+        self.assertAlmostEqual(sqnr[1], expected_8, places=6)
+        self.assertTrue(np.all(np.diff(sqnr) > 20))
+        
+        # Silence fills the caller's buffers instead of returning the input.
+        silence = np.zeros(100, dtype=np.float32)
+        out[:100] = error_out[:100] = 1
+        quantized, error = quantize_signal(silence, 8, out=out[:100], error_out=error_out[:100])
+        self.assertTrue(np.shares_memory(quantized, out) and np.shares_memory(error, error_out))
+        self.assertFalse(np.any(out[:100]) or np.any(error_out[:100]))
+        
+        # Channels share one full scale; silence has no quantization noise.
+        stereo = np.stack([self.signal, 0.5 * self.signal], axis=1)
+        _, stereo_sqnr = quantization_sweep(stereo, [4, 8, 12], block_size=300)
+        np.testing.assert_allclose(stereo_sqnr, quantization_sweep(stereo.reshape(-1), [4, 8, 12])[1])
+        with np.errstate(all='raise'):
+            _, silent_sqnr = quantization_sweep(np.zeros(1000), [4, 8])
+        np.testing.assert_array_equal(silent_sqnr, [np.inf, np.inf])
+
+    def test_job_runner_dedupes_and_supersedes(self):
+        import threading
+        runner = JobRunner(max_workers=1)
+        gate = threading.Event()
+        calls = []
+        
+        def stages(tag):
+            return [
+                ('wait', lambda r: gate.wait(5)),
+                ('work', lambda r: calls.append(tag) or tag),
+            ]
+        
+        first = runner.submit(('lowpass', 1), stages(1), slot='session')
+        self.assertIs(runner.submit(('lowpass', 1), stages(1), slot='session'), first)
+        
+        second = runner.submit(('lowpass', 2), stages(2), slot='session')
+        third = runner.submit(('lowpass', 3), stages(3), slot='session')
+        gate.set()
+        
+        self.assertEqual(third.result(timeout=5)['work'], 3)
+        self.assertEqual(third.progress, 1.0)
+        with self.assertRaises(JobCancelled):
+            first.result(timeout=5)
+        with self.assertRaises(JobCancelled):
+            second.result(timeout=5)
+        self.assertEqual(calls, [3])
+        
+        job = runner.run(apply_lowpass, self.signal, self.fs, 100)
+        np.testing.assert_allclose(job.result(timeout=5)['apply_lowpass'], apply_lowpass(self.signal, self.fs, 100))
+        runner.shutdown()
+
+    def test_export_audio_is_cached_and_compact(self):
+        cache_dir = tempfile.mkdtemp()
+        loud = 1.5 * self.signal
+        
+        path = export_audio(loud, self.fs, fmt='FLAC', cache_dir=cache_dir)
+        mtime = os.path.getmtime(path)
+        self.assertEqual(export_audio(loud.copy(), self.fs, fmt='FLAC', cache_dir=cache_dir), path)
+        self.assertEqual(os.path.getmtime(path), mtime)
+        
+        info = sf.info(path)
+        self.assertEqual(info.subtype, 'PCM_16')
+        decoded, fs = sf.read(path)
+        self.assertEqual(fs, self.fs)
+        np.testing.assert_allclose(decoded, np.clip(loud, -1, 1), atol=1e-4)
+        
+        wav_path = export_audio(loud, self.fs, cache_dir=cache_dir)
+        self.assertTrue(wav_path.endswith('.wav'))
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+        
+        # New exports evict the least recently used ones beyond the budget.
+        budget = 2 * os.path.getsize(wav_path) + 100
+        export_audio(loud, self.fs, cache_dir=cache_dir, max_bytes=budget)
+        newer = export_audio(0.5 * self.signal, self.fs, cache_dir=cache_dir, max_bytes=budget)
+        newest = export_audio(0.25 * self.signal, self.fs, cache_dir=cache_dir, max_bytes=budget)
+        self.assertEqual(sorted(os.listdir(cache_dir)), sorted([os.path.basename(newer), os.path.basename(newest)]))
+
+    def test_batch_runner_processes_and_resumes(self):
+        in_dir = tempfile.mkdtemp()
+        out_dir = tempfile.mkdtemp()
+        for name in ('a.wav', 'b.wav'):
+            sf.write(os.path.join(in_dir, name), np.tile(self.signal, 3), 8000)
+        
+        root, inputs = find_inputs(in_dir)
+        self.assertEqual(len(inputs), 2)
+        
+        spec = {'lowpass': 1000, 'resample': 4000, 'bits': 8, 'format': 'wav', 'block_size': 1000}
+        summary = run_batch(inputs, root, out_dir, spec, log=lambda msg: None)
+        self.assertEqual(summary['processed'], 2)
+        
+        info = sf.info(os.path.join(out_dir, 'a.wav'))
+        self.assertEqual(info.samplerate, 4000)
+        self.assertEqual(info.frames, 1500)
+        
+        summary = run_batch(inputs, root, out_dir, spec, log=lambda msg: None)
+        self.assertEqual(summary['processed'], 0)
+        self.assertEqual(summary['skipped'], 2)
+        
+        # Different settings into the same directory reprocess every file.
+        summary = run_batch(inputs, root, out_dir, dict(spec, resample=2000), log=lambda msg: None)
+        self.assertEqual(summary['processed'], 2)
+        self.assertEqual(sf.info(os.path.join(out_dir, 'a.wav')).samplerate, 2000)
+        
+        # An output directory inside the input tree is not read back as input.
+        nested = os.path.join(in_dir, 'clean')
+        run_batch(inputs, root, nested, spec, log=lambda msg: None)
+        self.assertEqual(find_inputs(in_dir, exclude=nested)[1], inputs)
+        
+        # A failed file leaves no partial output behind (here the output
+        # path is taken by a directory, so the final rename fails).
+        bad = os.path.join(in_dir, 'bad.wav')
+        sf.write(bad, self.signal, 8000)
+        os.makedirs(os.path.join(out_dir, 'bad.wav'))
+        summary = run_batch([bad], root, out_dir, spec, log=lambda msg: None)
+        self.assertEqual(summary['failed'], 1)
+        self.assertFalse(os.path.exists(os.path.join(out_dir, 'bad.wav.part')))
+
+    def test_pipeline_matches_separate_functions(self):
+        t = np.arange(0, 3, 1/8000)
+        signal = 0.8 * np.sin(2 * np.pi * 440 * t) + 0.1 * np.sin(2 * np.pi * 3000 * t)
+        
+        pipe = Pipeline([Lowpass(1000), Resample(4000), Gain(0.5), Quantize(8), Spectrum(256)], 8000, block_size=1000)
+        self.assertEqual(pipe.out_fs, 4000)
+        self.assertEqual(len(pipe._plan), 4)
+        out = pipe.run(signal)
+        
+        filtered = apply_lowpass(signal, 8000, 1000)
+        resampled, _ = sample_signal(filtered, 8000, 4000)
+        expected, _ = quantize_signal(0.5 * resampled, 8, max_val=1.0)
+        np.testing.assert_allclose(out, expected, atol=1e-12)
+        
+        freqs, mag = pipe.stages[-1].result()
+        _, expected_mag = compute_welch(expected, 4000, nperseg=256)
+        np.testing.assert_allclose(mag, expected_mag, atol=1e-12)
+        
+        streamed = np.concatenate([b.copy() for b in pipe.stream(iter_blocks(signal, 333))])
+        np.testing.assert_allclose(streamed, out, atol=1e-12)
+        
+        class Incomplete(ElementwiseStage):
+            pass
+        with self.assertRaises(TypeError):
+            Incomplete()
+        
+        # The framer's state advances on push, even if the result is dropped.
+        framer = STFTFramer(8000, nperseg=256, batch_frames=4)
+        framer.push(signal[:1000])
+        batches = framer.push(signal[1000:2000])
+        self.assertEqual([len(spectra) for _, spectra in batches], [4, 4])
+        np.testing.assert_allclose(batches[0][0][0], (6 * 128 + 128) / 8000)
+
+    def test_fft_plan_pads_to_fast_length(self):
+        plan = plan_fft(997)
+        self.assertGreater(plan.nfft, 997)
+        self.assertEqual(plan.padding, plan.nfft - 997)
+        self.assertIs(plan_fft(997), plan)
+        self.assertEqual(plan_fft(997, 'exact').nfft, 997)
+        
+        signal = np.sin(2 * np.pi * 50 * np.arange(997) / self.fs)
+        freqs, mag, _, used = compute_fft(signal, self.fs, window_type='Hann', nfft='fast', return_plan=True)
+        self.assertEqual(used.nfft, plan.nfft)
+        self.assertEqual(len(freqs), plan.nfft // 2 + 1)
+        
+        # Padding only resamples the spectrum onto a finer grid.
+        exact_freqs, exact_mag, _ = compute_fft(signal, self.fs, window_type='Hann', nfft='exact')
+        self.assertAlmostEqual(np.max(mag), np.max(exact_mag), delta=0.01)
+        padded_freqs, padded_mag, _ = compute_fft(signal, self.fs, window_type='Hann', nfft=4 * 997)
+        np.testing.assert_allclose(padded_mag[::4], exact_mag, atol=1e-12)
+        
+        with self.assertRaises(ValueError):
+            plan_fft(100, 50)
+        
+        # Padding is opt-in.
+        self.assertEqual(len(compute_fft(signal, self.fs)[0]), 997 // 2 + 1)
+        
+        # Frame-size windows are shared; a window over a whole signal is not kept.
+        self.assertIs(get_window_array('Hann', 1024), get_window_array('Hann', 1024))
+        long_window = get_window_array('Hann', 1 << 20)
+        self.assertIsNot(get_window_array('Hann', 1 << 20), long_window)
+        self.assertFalse(long_window.flags.writeable)
+
+    def test_spectral_peaks_and_tracker(self):
+        t = np.arange(self.fs) / self.fs
+        tones = np.sin(2 * np.pi * 100.3 * t) + 0.5 * np.sin(2 * np.pi * 250.7 * t)
+        freqs, mag, _ = compute_fft(tones, self.fs, window_type='Hann', nfft='exact')
+        
+        peak_freqs, peak_mags, bins = spectral_peaks(mag, freqs, k=2)
+        np.testing.assert_allclose(peak_freqs, [100.3, 250.7], atol=0.05)
+        self.assertGreater(peak_mags[0], peak_mags[1])
+        np.testing.assert_array_equal(bins, [100, 251])
+        
+        log_freqs, log_mags, _ = spectral_peaks(20 * np.log10(mag + 1e-10), freqs, k=2, scale='Log')
+        np.testing.assert_allclose(log_freqs, peak_freqs)
+        np.testing.assert_allclose(log_mags, 20 * np.log10(peak_mags), atol=1e-6)
+        
+        # Frequency rises linearly from 100 Hz to 300 Hz.
+        chirp = np.sin(2 * np.pi * (100 * t + 100 * t ** 2))
+        times, tracked, _ = track_peaks(chirp, self.fs, nperseg=128, k=1)
+        np.testing.assert_allclose(tracked[:, 0], 100 + 200 * times, atol=4)
+        
+        _, streamed, _ = track_peaks(iter_blocks(chirp, 90), self.fs, nperseg=128, k=1)
+        np.testing.assert_allclose(streamed, tracked)
+
+    def test_estimate_bandwidth(self):
+        fs = 8000
+        t = np.arange(4 * fs) / fs
+        rng = np.random.default_rng(0)
+        signal = np.sin(2 * np.pi * 300 * t) + 0.5 * np.sin(2 * np.pi * 1200 * t)
+        noisy = signal + rng.normal(0, 0.001, len(t))
+        
+        f_max, occupied = estimate_bandwidth(noisy, fs, nperseg=1024)
+        self.assertAlmostEqual(f_max, 1200, delta=3 * fs / 1024)
+        self.assertGreater(occupied, 300)
+        self.assertLessEqual(occupied, f_max + fs / 1024)
+        
+        streamed = estimate_bandwidth(iter_blocks(noisy, 5000), fs, nperseg=1024)
+        self.assertEqual(streamed, (f_max, occupied))
+        self.assertEqual(estimate_bandwidth(np.zeros(100), fs), (0.0, 0.0))
+
+    def test_filter_types_design_cache_and_axis(self):
+        sos = design_filter(self.fs, 'lowpass', 100, order=8)
+        self.assertEqual(sos.shape, (4, 6))
+        sos[0, 0] = 0.0
+        self.assertNotEqual(design_filter(self.fs, 'lowpass', 100, order=8)[0, 0], 0.0)
+        
+        t = np.arange(2 * self.fs) / self.fs
+        low, mid, high = (np.sin(2 * np.pi * f * t) for f in (20, 150, 400))
+        mixed = low + mid + high
+        steady = slice(self.fs, None)
+        
+        def rms(x):
+            return np.sqrt(np.mean(x[steady] ** 2))
+        
+        # Zero-phase so each output lines up with the tone it should keep.
+        self.assertLess(rms(apply_filter(mixed, self.fs, 'highpass', 300, zero_phase=True) - high), 0.1)
+        self.assertLess(rms(apply_filter(mixed, self.fs, 'bandpass', (100, 200), zero_phase=True) - mid), 0.1)
+        notched = apply_filter(mixed, self.fs, 'notch', 150, zero_phase=True)
+        self.assertLess(rms(notched - low - high), 0.05)
+        
+        aligned = apply_lowpass(low, self.fs, 100, zero_phase=True)
+        self.assertLess(rms(aligned - low), 0.01)
+        
+        stereo = np.stack([mixed, low])
+        out = apply_lowpass(stereo, self.fs, 100, axis=-1)
+        np.testing.assert_allclose(out[0], apply_lowpass(mixed, self.fs, 100))
+        np.testing.assert_allclose(apply_lowpass(stereo.T, self.fs, 100, axis=0), out.T)
+        
+        with self.assertRaises(ValueError):
+            design_filter(self.fs, 'lowpass', self.fs)
+
+    def test_fir_fft_convolution_and_streaming(self):
+        rng = np.random.default_rng(0)
+        x = rng.normal(size=5000)
+        taps = design_fir(self.fs, 'lowpass', 100, numtaps=400)
+        self.assertEqual(len(taps), 401)
+        
+        causal = np.convolve(x, taps)[:len(x)]
+        np.testing.assert_allclose(fir_filter(x, taps, 'fft', compensate_delay=False), causal, atol=1e-12)
+        np.testing.assert_allclose(fir_filter(x, taps, 'direct', compensate_delay=False), causal, atol=1e-12)
+        
+        for method in ('direct', 'fft'):
+            fir = StreamingFIR(taps, method)
+            streamed = np.concatenate(list(fir.filter_blocks(iter_blocks(x, 777))))
+            np.testing.assert_allclose(streamed, causal, atol=1e-12)
+        
+        # Linear phase: the delay-compensated output lines up with the input tone.
+        aligned = apply_fir(self.signal, self.fs, 'lowpass', 100, numtaps=401)
+        np.testing.assert_allclose(aligned[250:-250], self.signal[250:-250], atol=0.01)
+        
+        stereo = np.stack([x, x[::-1]], axis=1)
+        out = apply_fir(stereo, self.fs, 'highpass', 200, numtaps=401)
+        np.testing.assert_allclose(out[:, 0], apply_fir(x, self.fs, 'highpass', 200, numtaps=401), atol=1e-12)
+        
+        piped = Pipeline([FIR('lowpass', 100, 401)], self.fs, block_size=300).run(x)
+        np.testing.assert_allclose(piped, fir_filter(x, taps), atol=1e-12)
+
+    def test_spectral_noise_reduction(self):
+        fs = 8000
+        t = np.arange(10 * fs) / fs
+        rng = np.random.default_rng(0)
+        phase = 2 * np.pi * np.cumsum(440 + 5 * np.sin(2 * np.pi * 5 * t)) / fs
+        clean = 0.5 * np.sin(phase) + 0.3 * np.sin(2 * phase) + 0.2 * np.sin(3 * phase)
+        noisy = clean + 0.1 * rng.normal(size=len(t))
+        
+        def snr(x):
+            return 10 * np.log10(np.sum(clean ** 2) / np.sum((x - clean) ** 2))
+        
+        # Unity gains reconstruct the input exactly, block by block.
+        passthrough = SpectralDenoiser(fs, np.zeros(1025), floor=1.0)
+        out = np.concatenate(list(passthrough.process_blocks(iter_blocks(noisy, 3000))))
+        np.testing.assert_allclose(out, noisy, atol=1e-12)
+        
+        for method in ('wiener', 'subtraction'):
+            denoised = reduce_noise(noisy, fs, method=method, strength=1.5)
+            self.assertEqual(len(denoised), len(noisy))
+            self.assertGreater(snr(denoised), snr(noisy) + 5)
+        
+        noise_only = 0.1 * rng.normal(size=2 * fs)
+        from_segment = estimate_noise_profile(np.concatenate([noise_only, clean]), fs, segment=(0, 2))
+        automatic = estimate_noise_profile(iter_blocks(noisy, 5000), fs)
+        expected = 0.01 * 1024  # noise variance x sum of the squared window
+        self.assertAlmostEqual(np.median(from_segment) / expected, 1, delta=0.1)
+        self.assertAlmostEqual(np.median(automatic) / expected, 1, delta=0.35)
+        
+        # An empty or sub-frame segment is widened to one frame, at the end
+        # of the signal by moving it back.
+        with self.assertRaises(ValueError):
+            estimate_noise_profile(noisy, fs, segment=(1.0, 1.0))
+        self.assertEqual(fit_noise_segment((1.0, 1.0), fs, len(noisy)), (1.0, 1.0 + 2048 / fs))
+        self.assertEqual(fit_noise_segment((10.0, 10.0), fs, len(noisy)), (10.0 - 2048 / fs, 10.0))
+        self.assertEqual(fit_noise_segment((0.0, 2.0), fs, len(noisy)), (0.0, 2.0))
+        for segment in [(1.0, 1.0), (1.0, 1.1), (10.0, 10.0)]:
+            fitted = estimate_noise_profile(noisy, fs, segment=fit_noise_segment(segment, fs, len(noisy)))
+            self.assertEqual(len(fitted), 1025)
+        with self.assertRaises(ValueError):
+            fit_noise_segment((0.0, 0.1), fs, 1000)
+
+    def test_multichannel_processing_along_axis(self):
+        rng = np.random.default_rng(0)
+        multi = rng.normal(size=(3000, 6))
+        
+        def per_channel(fn):
+            return np.stack([fn(np.ascontiguousarray(multi[:, c])) for c in range(multi.shape[1])], axis=1)
+        
+        np.testing.assert_allclose(apply_lowpass(multi, self.fs, 100),
+                                   per_channel(lambda x: apply_lowpass(x, self.fs, 100)), atol=1e-12)
+        np.testing.assert_allclose(apply_lowpass(multi, self.fs, 100, workers=3),
+                                   apply_lowpass(multi, self.fs, 100), atol=1e-12)
+        
+        for method in ('polyphase', 'fft'):
+            resampled, t = sample_signal(multi, self.fs, 300, method=method, workers=2)
+            self.assertEqual(resampled.shape, (900, 6))
+            np.testing.assert_allclose(resampled, per_channel(lambda x: sample_signal(x, self.fs, 300, method=method)[0]), atol=1e-12)
+        
+        _, mag, _ = compute_fft(multi, self.fs, window_type='Hann')
+        np.testing.assert_allclose(mag, per_channel(lambda x: compute_fft(x, self.fs, window_type='Hann')[1]), atol=1e-12)
+        
+        quantized, error = quantize_signal(multi, 4)
+        self.assertEqual(quantized.shape, multi.shape)
+        self.assertLessEqual(len(np.unique(quantized)), 16)
+        
+        groups = []
+        map_channels(lambda g: groups.append(g.shape) or g, multi, workers=4)
+        self.assertEqual(sorted(groups), [(3000, 1), (3000, 1), (3000, 2), (3000, 2)])
+        
+        fd, path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        sf.write(path, multi[:, :3] / 5, self.fs, subtype='FLOAT')
+        source = AudioSource(path, owns_file=True)
+        try:
+            self.assertEqual(source.channel_samples.shape, (3000, 3))
+            np.testing.assert_allclose(source.channel_samples, multi[:, :3] / 5, atol=1e-6)
+            with tempfile.TemporaryDirectory() as tmp:
+                exported = sf.info(export_audio(source.channel_samples, self.fs, cache_dir=tmp))
+                self.assertEqual(exported.channels, 3)
+        finally:
+            source.close()
+
+    def test_decode_compressed_audio_is_cached(self):
+        mp3 = os.path.join(os.path.dirname(__file__), 'test_singing_with_noise.mp3')
+        with tempfile.TemporaryDirectory() as cache_dir, tempfile.TemporaryDirectory() as src_dir:
+            path = decode_audio(mp3, cache_dir=cache_dir)
+            info = sf.info(path)
+            self.assertEqual(info.subtype, 'FLOAT')
+            self.assertEqual(info.frames, sf.info(mp3).frames)
+            
+            # The same bytes map to the same decoded file, which is reused.
+            self.assertEqual(decode_audio(mp3, cache_dir=cache_dir), path)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            
+            # Uploads are decoded into the shared cache, which close() keeps.
+            # The source reads its own link, so pruning the cache under it
+            # does not break it.
+            with open(mp3, 'rb') as f:
+                upload = io.BytesIO(f.read())
+            source = AudioSource.from_upload(upload, suffix='.mp3', cache_dir=cache_dir)
+            self.assertNotEqual(source.path, path)
+            self.assertEqual(source.frames, info.frames)
+            self.assertTrue(source.owns_file)
+            os.rename(path, path + '.pruned')
+            self.assertEqual(len(source.read()), info.frames)
+            os.rename(path + '.pruned', path)
+            source.close()
+            self.assertTrue(os.path.exists(path))
+            
+            # A different file over budget evicts the least recently opened copy.
+            other = os.path.join(src_dir, 'other.ogg')
+            sf.write(other, 0.1 * self.signal, self.fs, format='OGG')
+            newest = decode_audio(other, cache_dir=cache_dir, max_bytes=os.path.getsize(path))
+            self.assertEqual(os.listdir(cache_dir), [os.path.basename(newest)])
+        
+        # Header parsing for piped decoder output skips unknown chunks.
+        wav = io.BytesIO()
+        sf.write(wav, np.zeros((10, 3), dtype=np.float32), 22050, format='WAV', subtype='FLOAT')
+        wav.seek(0)
+        self.assertEqual(read_wav_header(wav), (22050, 3))
+        self.assertEqual(len(wav.read()), 10 * 3 * 4)
+
+    def test_disk_cache_persists_across_processes(self):
+        cache_dir = tempfile.mkdtemp()
+        calls = []
+        
+        def analyze(signal, fs):
+            calls.append(fs)
+            return np.abs(np.fft.rfft(signal)), float(fs), WaveformPyramid(signal)
+        
+        # Two memory caches and two DiskCache objects on the same directory
+        # stand in for two sessions in different processes.
+        first = cached(analyze, cache=ResultCache(), persist=True, disk_cache=DiskCache(cache_dir))
+        second_disk = DiskCache(cache_dir)
+        second = cached(analyze, cache=ResultCache(), persist=True, disk_cache=second_disk)
+        
+        spectrum, fs, pyramid = first(self.signal, self.fs)
+        spectrum2, fs2, pyramid2 = second(self.signal.copy(), self.fs)
+        self.assertEqual(calls, [self.fs])
+        self.assertIsInstance(spectrum2, np.memmap)
+        self.assertFalse(spectrum2.flags.writeable)
+        np.testing.assert_array_equal(spectrum2, spectrum)
+        self.assertEqual(fs2, fs)
+        self.assertIsInstance(pyramid2, WaveformPyramid)
+        self.assertEqual(pyramid2.peak, pyramid.peak)
+        np.testing.assert_array_equal(pyramid2.envelope(0, 1000, 100)[1], pyramid.envelope(0, 1000, 100)[1])
+        self.assertEqual(second_disk.stats()['hits'], 1)
+        
+        # Size-based eviction keeps the most recently used entries.
+        entry_bytes = second_disk.stats()['bytes']
+        second_disk.resize(int(2.5 * entry_bytes))
+        for gain in (2, 3):
+            second(self.signal * gain, self.fs)
+        stats = second_disk.stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+        self.assertIsNone(second_disk.get(('missing',)))
+
+    def test_pages_load_lazily(self):
+        # A fresh interpreter paints Studio Home (bare mode), then opens one page.
+        script = (
+            "import sys, json, dsp_studio_app\n"
+            "from interface.pages import HEAVY_MODULES, load_page, import_times\n"
+            "home = [m for m in HEAVY_MODULES if m in sys.modules]\n"
+            "page = load_page('Fourier Analysis')\n"
+            "assert load_page('Fourier Analysis') is page and hasattr(page, 'render')\n"
+            "print(json.dumps([home, import_times()]))\n"
+        )
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, cwd=root)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        home, times = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertEqual(home, [])
+        self.assertEqual(list(times), ['interface.modules.fft_tab'])
+        self.assertGreater(times['interface.modules.fft_tab']['modules'], 0)
+
+    def test_metrics_registry_and_exports(self):
+        registry = MetricsRegistry()
+        
+        @timed(registry=registry)
+        def scale(signal, gain=2):
+            with stage('test.inner', registry=registry):
+                inner = np.ones(200_000)
+            return signal * gain + inner[:len(signal)]
+        
+        # Disabled: nothing is recorded.
+        scale(self.signal)
+        self.assertEqual(registry.snapshot(), {})
+        
+        registry.enable(track_allocations=True)
+        try:
+            scale(self.signal)
+            scale(self.signal, gain=3)
+        finally:
+            registry.disable()
+        snapshot = registry.snapshot()
+        entry = snapshot[f"{__name__}.TestDSP.test_metrics_registry_and_exports.<locals>.scale"]
+        self.assertEqual(entry['calls'], 2)
+        self.assertEqual(entry['input_bytes_total'], 2 * self.signal.nbytes)
+        self.assertGreater(entry['seconds_total'], 0)
+        # The outer peak includes the nested stage's allocation.
+        self.assertGreaterEqual(entry['alloc_peak_bytes'], 200_000 * 8)
+        self.assertGreaterEqual(snapshot['test.inner']['alloc_peak_bytes'], 200_000 * 8)
+        
+        self.assertEqual(json.loads(registry.to_json())['test.inner']['calls'], 2)
+        prom = registry.to_prometheus()
+        self.assertIn('# TYPE dsp_calls_total counter', prom)
+        self.assertIn('dsp_calls_total{name="test.inner"} 2', prom)
+        
+        # Cached wrappers count hits and misses under the function's name.
+        cached_square = cached(np.square, cache=ResultCache())
+        default_registry.enable()
+        try:
+            cached_square(self.signal)
+            cached_square(self.signal)
+        finally:
+            default_registry.disable()
+        entry = default_registry.snapshot()['numpy.square']
+        self.assertEqual((entry['cache_hits'], entry['cache_misses']), (1, 1))
+
+    def test_signal_hash_memo_only_for_immutable_arrays(self):
+        base = self.signal.copy()
+        view = base[:]
+        view.flags.writeable = False
+        before = signal_hash(view)
+        base[0] += 1.0
+        self.assertNotEqual(signal_hash(view), before)
+        
+        fd, path = tempfile.mkstemp(suffix='.f32')
+        os.close(fd)
+        try:
+            self.signal.astype(np.float32).tofile(path)
+            mapped = np.memmap(path, dtype=np.float32, mode='r')
+            self.assertEqual(signal_hash(mapped), signal_hash(self.signal.astype(np.float32)))
+            self.assertEqual(signal_hash(mapped), signal_hash(mapped))
+            del mapped
+        finally:
+            os.remove(path)
+
+    def test_job_runner_releases_finished_slots(self):
+        runner = JobRunner(max_workers=1, keep_finished=0)
+        try:
+            job = runner.submit('big', [('make', lambda r: np.zeros(100_000))], slot=('session', 1))
+            job.result()
+            del job
+            gc.collect()
+            # Nothing else holds the finished job, so the slot no longer does.
+            self.assertEqual(len(runner._slots), 0)
+        finally:
+            runner.shutdown()
+
 if __name__ == '__main__':
     unittest.main()